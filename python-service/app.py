@@ -1,28 +1,77 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response, Depends, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, validator, Field
+from fastapi.exceptions import RequestValidationError
+from fastapi.openapi.utils import get_openapi
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, validator, Field, ValidationError
 import pandas as pd
 import joblib
 import os
 import sys
 import logging
-from typing import List, Optional
+import csv
+import io
+import itertools
+import json
+import re
+import tempfile
+from typing import Iterator, List, Optional, Tuple
 import numpy as np
-import joblib
-model = joblib.load("models/catboost-model.pkl")
+import asyncio
+import time
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import hmac
+from prediction_cache import PredictionCache, make_cache_key
+from model_registry import MODEL_EXTENSIONS, ModelEntry, ModelRegistry, ShadowScorer
+from metrics import MetricsMiddleware, MetricsRegistry, SIZE_BUCKETS
+from service_logging import configure_logging, sampled_debug
+from student_store import StudentStore
+from job_store import JobRunner, JobStore
+from tree_evaluator import TreeEvaluator, export_model_arrays, load_model_arrays, save_model_arrays
+from columnar import (ColumnarBatch, column_specs, validate_columns, decode_columns, encode_columns,
+                      MSGPACK_CONTENT_TYPES, ARROW_CONTENT_TYPES)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: records go through a queue and are written by a background thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))  # share of requests with debug detail
+LOG_REDACT_PII = os.getenv("LOG_REDACT_PII", "1").lower() in ("1", "true", "yes")
+
+configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_DEBUG_SAMPLE_RATE, LOG_REDACT_PII)
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except ImportError:  # optional, responses then use the standard library encoder
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with orjson when it is installed (NaN becomes null)."""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def json_line(value) -> str:
+    """One NDJSON line, encoded with orjson when it is installed."""
+    if orjson is None:
+        return json.dumps(value) + "\n"
+    return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE).decode()
+
+
 # Initialize FastAPI
 app = FastAPI(
     title="Student Dropout Prediction Service",
     description="CatBoost model for predicting student dropout risk",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Enable CORS for all origins
@@ -34,49 +83,224 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global model variable
-model = None
-model_metadata = {}
+# Model file to serve first, relative to this file unless absolute (.pkl via joblib or native CatBoost .cbm)
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join("models", "catboost-model.pkl"))
+
+# Scoring backend: "catboost", or "numpy" to score with tree_evaluator from .npz arrays
+# (see --export-arrays) without importing catboost; CatBoost files are converted on load
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "catboost")
+
+# Model registry: other versions in MODEL_DIR, A/B candidate, shadow model and hot reload
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_CANDIDATE = os.getenv("MODEL_CANDIDATE", "")
+MODEL_CANDIDATE_PERCENT = float(os.getenv("MODEL_CANDIDATE_PERCENT", "0"))
+MODEL_SHADOW = os.getenv("MODEL_SHADOW", "")
+MODEL_WATCH_INTERVAL_SECONDS = float(os.getenv("MODEL_WATCH_INTERVAL_SECONDS", "10"))  # 0 disables
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "8"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # required as X-Admin-Token on /admin routes, which are refused while unset
+
+# Synthetic rows scored after loading, before the service reports ready (0 disables warmup)
+WARMUP_ROWS = int(os.getenv("WARMUP_ROWS", "256"))
+WARMUP_SINGLE_CALLS = int(os.getenv("WARMUP_SINGLE_CALLS", "20"))
+
+# Set once the model is loaded and warmed up; drives /readyz
+service_ready = False
+
+# Upper bound on rows accepted by /batch-predict (override with BATCH_PREDICT_MAX_ROWS)
+MAX_BATCH_SIZE = int(os.getenv("BATCH_PREDICT_MAX_ROWS", "50000"))
+
+# Inference worker pool settings
+INFERENCE_POOL = os.getenv("INFERENCE_POOL", "thread")  # "thread" or "process"
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", "64"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+
+# Micro-batching of concurrent /predict calls (opt-in)
+PREDICT_MICROBATCH = os.getenv("PREDICT_MICROBATCH", "0").lower() in ("1", "true", "yes")
+MICROBATCH_WINDOW_MS = float(os.getenv("MICROBATCH_WINDOW_MS", "5"))
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "64"))
+
+# Streaming bulk scoring: rows scored per chunk and in-memory spool size before spilling to disk
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+STREAM_SPOOL_BYTES = int(os.getenv("STREAM_SPOOL_BYTES", str(8 * 1024 * 1024)))
+# A chunk rejected by a full or restarting inference pool is retried with backoff for up to this long
+STREAM_RETRY_SECONDS = float(os.getenv("STREAM_RETRY_SECONDS", "300"))
+
+# Prediction result cache (PREDICTION_CACHE_SIZE=0 disables it)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "300"))
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", "")  # SQLite file shared by local workers
+
+prediction_cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS, PREDICTION_CACHE_PATH)
+
+# Incremental re-scoring: last result per studentId, relative to this file unless absolute
+STUDENT_STORE_PATH = os.getenv("STUDENT_STORE_PATH", os.path.join("data", "student_scores.sqlite3"))
+
+student_store = StudentStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), STUDENT_STORE_PATH))
+
+# Explanations: top contributing features per student from CatBoost SHAP values
+EXPLANATION_TOP_K = int(os.getenv("EXPLANATION_TOP_K", "5"))
+EXPLANATION_SHAP_CALC_TYPE = os.getenv("EXPLANATION_SHAP_CALC_TYPE", "Regular")  # "Approximate" is about 2x faster
+
+# Background scoring jobs, persisted in SQLite (relative to this file unless absolute)
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join("data", "jobs.sqlite3"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # scoring threads per process; 0 disables the runner
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "500"))
+JOB_MAX_ROWS = int(os.getenv("JOB_MAX_ROWS", "1000000"))
+JOB_MAX_DEFER_SECONDS = float(os.getenv("JOB_MAX_DEFER_SECONDS", "2"))  # longest a chunk yields to interactive requests
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+JOB_RESULTS_MAX_PAGE = int(os.getenv("JOB_RESULTS_MAX_PAGE", "10000"))
+
+job_store = JobStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), JOB_STORE_PATH))
 
-# Load the model
-def load_model():
-    global model, model_metadata
+# Prometheus metrics, served on /metrics
+METRICS_ENDPOINTS = ["/predict", "/batch-predict", "/batch-predict/stream", "/cohort-risk", "/jobs", "/health",
+                    "/livez", "/readyz", "/metrics"]
+STAGE_METRIC = "prediction_stage_duration_seconds"
+
+metrics = MetricsRegistry()
+metrics.histogram("http_request_duration_seconds", "HTTP request latency by endpoint")
+metrics.counter("http_requests_total", "HTTP requests by endpoint and status code")
+metrics.gauge("http_requests_in_flight", "HTTP requests currently being served by endpoint")
+metrics.histogram(STAGE_METRIC, "Time spent in each prediction stage by endpoint")
+metrics.histogram("prediction_batch_size", "Rows per scoring call by endpoint", SIZE_BUCKETS)
+metrics.histogram("inference_queue_wait_seconds", "Time jobs wait in the inference pool before running")
+metrics.counter("prediction_rows_total", "Rows answered, by source (model or cache)")
+metrics.counter("prediction_errors_total", "Prediction failures by type")
+metrics.counter("prediction_numpy_fallback_total", "Times predict_proba fell back to the numpy-array path")
+metrics.counter("stream_chunk_retries_total", "Streamed chunks retried after the inference pool was full or unavailable")
+metrics.gauge("model_load_duration_seconds", "Time to read the model file, by model")
+metrics.gauge("model_warmup_duration_seconds", "Time to warm up the model, by model")
+
+app.add_middleware(MetricsMiddleware, registry=metrics, tracked_paths=METRICS_ENDPOINTS)
+
+# PredictionRequest fields in the same positional order as prepare_features
+FEATURE_FIELDS = [
+    'age',
+    'gender',
+    'nationality',
+    'highschool_score',
+    'entrance_exam_score_normalized',
+    'department',
+    'admission_type',
+    'family_income_bracket',
+    'parent_education',
+    'scholarship_status',
+    'residence_type',
+    'commute_distance_km',
+    'department_missing',
+    'admission_type_missing',
+    'backlogs_count_missing',
+    'scholarship_status_missing',
+    'fee_payment_status_missing',
+    'residence_type_missing',
+    'family_income_bracket_missing',
+    'commute_distance_km_missing'
+]
+
+def resolve_model_path(model_path: str) -> str:
+    """Resolve a model path relative to this file (app.py)."""
+    if os.path.isabs(model_path):
+        return model_path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), model_path)
+
+
+def read_catboost_model(model_path: str):
+    """Read a CatBoost model from disk; native .cbm files skip unpickling entirely."""
+    if model_path.endswith(".cbm"):
+        from catboost import CatBoostClassifier
+
+        native_model = CatBoostClassifier()
+        native_model.load_model(model_path, format="cbm")
+        return native_model
+    return joblib.load(model_path)
+
+
+def read_model_file(model_path: str):
+    """Read a model for MODEL_BACKEND; exported .npz arrays always load as a TreeEvaluator."""
+    if model_path.endswith(".npz"):
+        return TreeEvaluator.load(model_path)
+    model = read_catboost_model(model_path)
+    if MODEL_BACKEND == "numpy":
+        return TreeEvaluator.from_model(model)
+    return model
+
+# Load one model file into a registry entry
+def load_model_entry(name: str, model_path: str) -> ModelEntry:
+    """Read a model file and build its entry: metadata, feature plan, warmup."""
+    logger.info(f"Loading model '{name}' from: {model_path}")
+    load_started = time.perf_counter()
+    model = read_model_file(model_path)
+
+    model_metadata = {
+        "name": name,
+        "path": model_path,
+        "load_seconds": round(time.perf_counter() - load_started, 4),
+        "version": model_file_version(model_path),
+        "backend": "numpy" if isinstance(model, TreeEvaluator) else "catboost"
+    }
+    logger.info(f"Model version: {model_metadata['version']} (loaded in {model_metadata['load_seconds']}s)")
+
+    # Extract model metadata
+    if hasattr(model, "classes_"):
+        model_metadata["classes"] = model.classes_.tolist()
+        logger.info(f"Model classes: {model_metadata['classes']}")
+    if hasattr(model, "feature_names_"):
+        model_metadata["feature_names"] = model.feature_names_
+        logger.info(f"Model feature names: {model.feature_names_}")
+    if hasattr(model, "n_features_in_"):
+        # Models loaded from .cbm report 0 here
+        model_metadata["n_features"] = model.n_features_in_ or len(model_metadata.get("feature_names", []))
+        logger.info(f"Model features: {model_metadata['n_features']}")
+
+    model_metadata["categorical_features"] = debug_model_features(model)
+    entry = ModelEntry(name, model_path, model, model_metadata, build_feature_plan(model_metadata))
+
+    # Warm up before the entry is published, so a hot swap keeps latency steady
     try:
-        # Build the path relative to this file (app.py)
-        model_path = os.path.join(os.path.dirname(__file__), "models", "catboost-model.pkl")
+        warmup_model(entry)
+    except Exception as e:
+        logger.warning(f"⚠ Model warmup failed: {str(e)}")
 
-        if not os.path.exists(model_path):
-            raise FileNotFoundError(f"❌ Model file not found at: {model_path}")
+    metrics.set("model_load_duration_seconds", model_metadata["load_seconds"], model=name)
+    metrics.set("model_warmup_duration_seconds", model_metadata.get("warmup_seconds", 0), model=name)
 
-        logger.info(f"Loading model from: {model_path}")
-        model = joblib.load(model_path)
+    logger.info(f"✅ Model '{name}' loaded successfully")
+    return entry
 
-        # Extract model metadata
-        if hasattr(model, "classes_"):
-            model_metadata["classes"] = model.classes_.tolist()
-            logger.info(f"Model classes: {model_metadata['classes']}")
-        if hasattr(model, "n_features_in_"):
-            model_metadata["n_features"] = model.n_features_in_
-            logger.info(f"Model features: {model_metadata['n_features']}")
-        if hasattr(model, "feature_names_"):
-            model_metadata["feature_names"] = model.feature_names_
-            logger.info(f"Model feature names: {model.feature_names_}")
+# Load the default model and make it active
+def load_model(model_path: Optional[str] = None) -> Optional[ModelEntry]:
+    try:
+        model_path = resolve_model_path(model_path or MODEL_PATH)
+        exported_path = os.path.splitext(model_path)[0] + ".npz"
+        if MODEL_BACKEND == "numpy" and os.path.exists(exported_path):
+            model_path = exported_path
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"❌ Model file not found at: {model_path}")
 
-        debug_model_features()
-        logger.info("✅ Model loaded successfully")
-        print("✅ Model loaded. Feature names:", model.feature_names_)
+        name = os.path.splitext(os.path.basename(model_path))[0]
+        model_registry.load(name, model_path)
+        return model_registry.activate(name)
 
     except Exception as e:
         logger.error(f"❌ Error loading model: {str(e)}")
-        model = None
+        return None
+
+# Content hash of the model file, used to tell model versions apart
+def model_file_version(model_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
 
 # Debug function to identify categorical features
-def debug_model_features():
+def debug_model_features(model) -> list:
     try:
         if hasattr(model, 'get_cat_feature_indices'):
             cat_features = model.get_cat_feature_indices()
             logger.info(f"📊 Categorical feature indices: {cat_features}")
-            model_metadata['categorical_features'] = cat_features
             return cat_features
         else:
             logger.info("ℹ  Model doesn't have cat feature info, trying to extract from model")
@@ -84,20 +308,58 @@ def debug_model_features():
             if hasattr(model, '_cat_features'):
                 cat_features = model._cat_features
                 logger.info(f"📊 Found categorical features: {cat_features}")
-                model_metadata['categorical_features'] = cat_features
                 return cat_features
             else:
                 logger.info("ℹ  Using conservative approach - identifying likely categorical features")
                 # Based on your dataset, these are likely categorical
                 categorical_features = [1, 2, 5, 6, 11, 12, 13, 14, 15]  # indices for categorical columns
-                model_metadata['categorical_features'] = categorical_features
                 return categorical_features
     except Exception as e:
         logger.warning(f"⚠ Could not determine categorical features: {str(e)}")
         return []
 
-# Load model on startup
-load_model()
+# Resolve model column order and categorical handling once per model
+def build_feature_plan(model_metadata: dict) -> list:
+    """Return (PredictionRequest field, is categorical) for every model column.
+
+    Columns are matched to request fields by name, so models trained on different
+    feature sets can be served side by side; a column with no matching field is
+    scored as missing. Models without real feature names fall back to the
+    positional FEATURE_FIELDS order.
+    """
+    feature_names = model_metadata.get('feature_names') or []
+    categorical_features = set(model_metadata.get('categorical_features', []))
+    request_fields = set(PredictionRequest.model_fields) - {'userData'}
+
+    if not any(name in request_fields for name in feature_names):
+        n_features = model_metadata.get('n_features') or len(FEATURE_FIELDS)
+        feature_names = FEATURE_FIELDS[:n_features]
+
+    return [
+        (name if name in request_fields else None, i in categorical_features)
+        for i, name in enumerate(feature_names)
+    ]
+
+
+# Cache keys include the model version, so loading a model leaves the cache alone;
+# entries of replaced versions expire through TTL and pruning
+model_registry = ModelRegistry(
+    resolve_model_path(MODEL_DIR), load_model_entry,
+    extensions=(".npz",) + MODEL_EXTENSIONS if MODEL_BACKEND == "numpy" else MODEL_EXTENSIONS
+)
+
+# Allowed values of the enum-like request fields, shared by the row and columnar validation
+FIELD_CHOICES = {
+    'gender': ["M", "F", "O"],
+    'scholarship_status': ["none", "scholarship"],
+    'residence_type': ["day_scholar", "hostel"],
+    'fee_payment_status': ["on_time", "delayed"]
+}
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def choice_error(field: str) -> str:
+    return f"{field} must be one of: " + ", ".join(f'"{value}"' for value in FIELD_CHOICES[field])
 
 # Request body schemas
 class UserData(BaseModel):
@@ -107,11 +369,8 @@ class UserData(BaseModel):
 
     @validator('email')
     def validate_email(cls, v):
-        if v is not None:
-            import re
-            email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_regex, v):
-                raise ValueError('Invalid email format')
+        if v is not None and not EMAIL_PATTERN.match(v):
+            raise ValueError('Invalid email format')
         return v
 
 class PredictionRequest(BaseModel):
@@ -127,6 +386,11 @@ class PredictionRequest(BaseModel):
     scholarship_status: Optional[str] = None
     residence_type: Optional[str] = None
     commute_distance_km: Optional[float] = None
+    attendance_pct: Optional[float] = Field(None, ge=0, le=100)
+    current_sem_cgpa: Optional[float] = Field(None, ge=0, le=10)
+    aggregate_cgpa: Optional[float] = Field(None, ge=0, le=10)
+    backlogs_count: Optional[int] = Field(None, ge=0)
+    fee_payment_status: Optional[str] = None
     department_missing: int = Field(0, ge=0, le=1)
     admission_type_missing: int = Field(0, ge=0, le=1)
     backlogs_count_missing: int = Field(0, ge=0, le=1)
@@ -140,37 +404,78 @@ class PredictionRequest(BaseModel):
 
     @validator('gender')
     def validate_gender(cls, v):
-        if v not in ["M", "F", "O"]:
-            raise ValueError('gender must be one of: "M", "F", "O"')
+        if v not in FIELD_CHOICES['gender']:
+            raise ValueError(choice_error('gender'))
         return v
 
     @validator('scholarship_status')
     def validate_scholarship(cls, v):
-        if v is not None and v not in ["none", "scholarship"]:
-            raise ValueError('scholarship_status must be one of: "none", "scholarship"')
+        if v is not None and v not in FIELD_CHOICES['scholarship_status']:
+            raise ValueError(choice_error('scholarship_status'))
         return v
 
     @validator('residence_type')
     def validate_residence(cls, v):
-        if v is not None and v not in ["day_scholar", "hostel"]:
-            raise ValueError('residence_type must be one of: "day_scholar", "hostel"')
+        if v is not None and v not in FIELD_CHOICES['residence_type']:
+            raise ValueError(choice_error('residence_type'))
+        return v
+
+    @validator('fee_payment_status')
+    def validate_fee_payment(cls, v):
+        if v is not None and v not in FIELD_CHOICES['fee_payment_status']:
+            raise ValueError(choice_error('fee_payment_status'))
         return v
 
 class BatchPredictionRequest(BaseModel):
     predictions: List[PredictionRequest]
 
+
+def check_user_string(value) -> Optional[str]:
+    return None if isinstance(value, str) else "Input should be a valid string"
+
+
+def check_user_email(value) -> Optional[str]:
+    if not isinstance(value, str):
+        return "Input should be a valid string"
+    return None if EMAIL_PATTERN.match(value) else "Value error, Invalid email format"
+
+
+# Columnar batches: the same Field(ge=..., le=...) and choice rules, checked per column
+REQUEST_COLUMN_SPECS = column_specs(PredictionRequest, FIELD_CHOICES, choice_error)
+USER_DATA_COLUMN_CHECKS = {'name': check_user_string, 'email': check_user_email, 'studentId': check_user_string}
+
+# Liveness probe: the process is up and serving HTTP
+@app.get("/livez")
+async def liveness_check():
+    return {'status': 'alive'}
+
+
+# Readiness probe: the model is loaded and warmed up
+@app.get("/readyz")
+async def readiness_check():
+    if not service_ready:
+        raise HTTPException(status_code=503, detail="Model is loading or warming up")
+    return {'status': 'ready', 'model_version': model_registry.active().version}
+
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
+    entry = model_registry.active()
+    model_metadata = entry.metadata if entry else {}
     feature_names = model_metadata.get('feature_names', [])
-    status = 'OK' if model is not None else 'ERROR'
+    status = 'OK' if entry is not None else 'ERROR'
     return {
         'status': status,
-        'model_loaded': model is not None,
+        'model_loaded': entry is not None,
+        'model_version': model_metadata.get('version'),
+        'ready': service_ready,
         'model_features': len(feature_names),   # number of features
         'model_feature_names': feature_names,   # list of feature names
         'model_classes': model_metadata.get('classes', 'unknown'),
         'categorical_features': model_metadata.get('categorical_features', 'unknown'),
+        'prediction_cache': prediction_cache.stats(),
+        'student_store': student_store.stats(),
         'service': 'Student Dropout Prediction API'
     }
 
@@ -178,12 +483,15 @@ async def health_check():
 # Model info endpoint
 @app.get("/model-info")
 async def model_info():
+    entry = model_registry.active()
+    model_metadata = entry.metadata if entry else {}
     return {
-        'model_type': 'CatBoostClassifier',
+        'model_type': type(entry.model).__name__ if entry else 'CatBoostClassifier',
         'input_features': 25,  # Updated feature count including missing flags
         'target_classes': model_metadata.get('classes', ['dropout', 'not_dropout']),
-        'status': 'loaded' if model is not None else 'not_loaded',
+        'status': 'loaded' if entry is not None else 'not_loaded',
         'metadata': model_metadata,
+        'registry': model_registry.status(),
         'feature_description': {
             'age': 'Student age (15-100)',
             'gender': 'Gender: M, F, or O',
@@ -205,15 +513,48 @@ async def model_info():
         }
     }
 
+# Prometheus metrics endpoint
+def collect_service_metrics():
+    """Scrape-time values that are already tracked elsewhere."""
+    cache_stats = prediction_cache.stats()
+    active = model_registry.active()
+    yield ("prediction_cache_hits_total", "counter", "Prediction cache hits", [({}, cache_stats['hits'])])
+    yield ("prediction_cache_misses_total", "counter", "Prediction cache misses", [({}, cache_stats['misses'])])
+    yield ("prediction_cache_entries", "gauge", "Entries in the prediction cache", [({}, cache_stats['entries'])])
+    yield ("inference_pending", "gauge", "Jobs queued or running in the inference pool", [({}, inference_pending)])
+    yield ("service_ready", "gauge", "1 once the model is loaded and warmed up", [({}, int(service_ready))])
+    yield ("scoring_jobs", "gauge", "Background scoring jobs by status", [
+        ({'status': status}, count) for status, count in job_store.counts().items()
+    ])
+    yield ("model_info", "gauge", "Loaded models; 1 for the active one", [
+        ({'model': name, 'version': entry.version}, int(entry is active))
+        for name, entry in list(model_registry.models.items())
+    ])
+
+
+metrics.add_collector(collect_service_metrics)
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def observe_parse_stage(request: Request, endpoint: str):
+    """Record the time from request arrival to the endpoint running: body read plus Pydantic validation."""
+    received_at = request.scope.get("state", {}).get("received_at")
+    if received_at is not None:
+        metrics.observe(STAGE_METRIC, time.perf_counter() - received_at, endpoint=endpoint, stage="parse_validate")
+
 # Get the correct feature names based on your unified dataset
-def get_feature_names():
-    """Return the exact feature names expected by the loaded model."""
-    if model_metadata.get('feature_names'):
-        return model_metadata['feature_names']
+def get_feature_names(entry: ModelEntry):
+    """Return the exact feature names expected by the given model."""
+    if entry.metadata.get('feature_names'):
+        return entry.metadata['feature_names']
     
     # Fallback: if model has n_features_in_ but no names, generate generic names
-    if hasattr(model, 'n_features_in_'):
-        return [f'feature_{i}' for i in range(model.n_features_in_)]
+    if entry.metadata.get('n_features'):
+        return [f'feature_{i}' for i in range(entry.metadata['n_features'])]
     
     raise ValueError("Model feature names not available. Cannot create DataFrame for prediction.")
 
@@ -243,243 +584,1449 @@ def prepare_features(data: PredictionRequest):
     ]
     return features
 
+def build_feature_column(values, categorical: bool) -> np.ndarray:
+    """Convert one raw feature column into the array the model expects.
+
+    Applies the same rules as the per-row processing: categorical values become
+    strings with missing values as "nan", everything else becomes float64 with NaN.
+    """
+    if not categorical:
+        # None is coerced to NaN by numpy when the target dtype is float
+        return np.array(values, dtype=np.float64)
+
+    raw = np.array(values, dtype=object)
+    column = raw.astype(str).astype(object)
+    column[pd.isna(raw)] = "nan"
+    return column
+
+
+def prepare_feature_frame(rows: List[PredictionRequest], entry: ModelEntry) -> pd.DataFrame:
+    """Build the model input DataFrame for a batch of requests, one column at a time."""
+    columns = {
+        field: [getattr(row, field) for row in rows]
+        for field, _ in entry.feature_plan if field
+    }
+    return prepare_column_frame(columns, len(rows), entry)
+
+
+def prepare_column_frame(columns: dict, n_rows: int, entry: ModelEntry) -> pd.DataFrame:
+    """Build the model input DataFrame from request field columns."""
+    feature_names = get_feature_names(entry)
+
+    frame_columns = {}
+    for name, (field, categorical) in zip(feature_names, entry.feature_plan):
+        values = columns[field] if field else [None] * n_rows
+        frame_columns[name] = build_feature_column(values, categorical)
+
+    return pd.DataFrame(frame_columns, columns=feature_names)
+
+def prepare_model_row(data: PredictionRequest, entry: ModelEntry) -> list:
+    """Build one model input row in model column order using the model's feature plan."""
+    row = []
+    for field, categorical in entry.feature_plan:
+        value = getattr(data, field) if field else None
+        if categorical:
+            row.append("nan" if value is None else str(value))
+        else:
+            row.append(np.nan if value is None else float(value))
+    return row
+
+
+# Risk tiers in order of severity; compact responses send the index into this list
+RISK_LEVELS = ['Low Risk', 'Medium Risk', 'High Risk']
+RISK_CODES = {level: code for code, level in enumerate(RISK_LEVELS)}
+
+
+def build_prediction_result(probabilities, entry: ModelEntry) -> dict:
+    """Build the model-derived part of a response from one row of predict_proba output.
+
+    The predicted class is the argmax of the probabilities, which is what
+    model.predict returns, so the model only has to run once.
+    """
+    actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+    predicted_class = actual_classes[int(np.argmax(probabilities))]
+    confidence = float(np.max(probabilities))
+
+    return {
+        'prediction': predicted_class,
+        'probabilities': {
+            class_name: float(probabilities[i])
+            for i, class_name in enumerate(actual_classes)
+        },
+        'confidence': confidence,
+        'risk_level': 'High Risk' if predicted_class == 'dropout' and confidence > 0.7 else
+                    'Medium Risk' if predicted_class == 'dropout' else 'Low Risk'
+    }
+
+
+def build_result_columns(probabilities: np.ndarray, entry: ModelEntry) -> dict:
+    """Columnar version of build_prediction_result for a whole predict_proba output."""
+    actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+    predicted = np.array(actual_classes, dtype=object)[np.argmax(probabilities, axis=1)]
+    confidence = probabilities.max(axis=1)
+    dropout = predicted == 'dropout'
+    risk_codes = np.where(dropout & (confidence > 0.7), 2, np.where(dropout, 1, 0))
+
+    columns = {'prediction': predicted.tolist()}
+    for i, class_name in enumerate(actual_classes):
+        columns[f'probability_{class_name}'] = probabilities[:, i].tolist()
+    columns['confidence'] = confidence.tolist()
+    columns['risk_level'] = np.array(RISK_LEVELS, dtype=object)[risk_codes].tolist()
+    return columns
+
+
+def compact_result_columns(columns: dict, entry: ModelEntry) -> dict:
+    """The compact /batch-predict response: parallel arrays, without userData echo or per-row objects.
+
+    probabilities[class][i] and risk_codes[i] (an index into risk_levels) belong to row i.
+    Status and explanation arrays are included when the request asked for them.
+    """
+    actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+    compact = {
+        'count': len(columns['prediction']),
+        'classes': actual_classes,
+        'probabilities': {name: columns[f'probability_{name}'] for name in actual_classes},
+        'risk_levels': RISK_LEVELS,
+        'risk_codes': [RISK_CODES[level] for level in columns['risk_level']]
+    }
+    for name in OPTIONAL_RESULT_FIELDS:
+        if name in columns:
+            compact[name] = columns[name]
+    return compact
+
+
+# Result fields only present when a request option asks for them
+OPTIONAL_RESULT_FIELDS = ('status', 'explanation')
+
+
+def prediction_rows_to_columns(predictions: List[dict], entry: ModelEntry) -> dict:
+    """Turn /batch-predict row results into result columns (userData fields become columns)."""
+    columns = {'index': [result['index'] for result in predictions]}
+    columns['prediction'] = [result['prediction'] for result in predictions]
+    for class_name in entry.metadata.get('classes', ['dropout', 'not_dropout']):
+        columns[f'probability_{class_name}'] = [result['probabilities'][class_name] for result in predictions]
+    columns['confidence'] = [result['confidence'] for result in predictions]
+    columns['risk_level'] = [result['risk_level'] for result in predictions]
+
+    for name in USER_DATA_COLUMN_CHECKS:
+        if any(name in result.get('userData', {}) for result in predictions):
+            columns[name] = [result.get('userData', {}).get(name) for result in predictions]
+    for name in OPTIONAL_RESULT_FIELDS:
+        if predictions and name in predictions[0]:
+            columns[name] = [result[name] for result in predictions]
+    return columns
+
+
+def prediction_columns_to_rows(columns: dict) -> List[dict]:
+    """Turn result columns back into the usual /batch-predict row results."""
+    class_names = [name[len('probability_'):] for name in columns if name.startswith('probability_')]
+    user_fields = [name for name in USER_DATA_COLUMN_CHECKS if name in columns]
+
+    predictions = []
+    for i in range(len(columns['prediction'])):
+        result = {
+            'prediction': columns['prediction'][i],
+            'probabilities': {name: columns[f'probability_{name}'][i] for name in class_names},
+            'confidence': columns['confidence'][i],
+            'risk_level': columns['risk_level'][i],
+            'index': columns['index'][i]
+        }
+        user_data = {name: columns[name][i] for name in user_fields if columns[name][i] is not None}
+        if user_data:
+            result['userData'] = user_data
+        for name in OPTIONAL_RESULT_FIELDS:
+            if name in columns:
+                result[name] = columns[name][i]
+        predictions.append(result)
+    return predictions
+
+
+def attach_request_fields(result: dict, user_data: Optional[UserData] = None, index: Optional[int] = None) -> dict:
+    """Copy a (possibly cached) result and add the per-request index and userData echo."""
+    response = dict(result)
+    if index is not None:
+        response['index'] = index
+
+    # Include user data in response if provided
+    if user_data:
+        response['userData'] = user_data.model_dump(exclude_unset=True)
+
+    return response
+
+
+def prediction_cache_key(row: list, entry: ModelEntry) -> str:
+    """Cache key for a request: its prepared model row plus the model version."""
+    return make_cache_key(row, entry.version)
+
+
+def predict_frame_proba(df: pd.DataFrame, entry: ModelEntry) -> np.ndarray:
+    """Run predict_proba on a prepared feature frame, with the numpy-array fallback."""
+    model = entry.model
+    try:
+        return model.predict_proba(df)
+    except Exception as pred_error:
+        if isinstance(model, TreeEvaluator):
+            # The fallback only works around CatBoost input handling
+            raise
+        logger.error("Batch prediction failed with DataFrame, trying numpy array: %s", pred_error)
+        metrics.inc("prediction_numpy_fallback_total", path="batch")
+        categorical_features = entry.cat_indices
+
+        # Convert to numpy array with categorical handling
+        numpy_columns = []
+        for j, column_name in enumerate(df.columns):
+            column = df[column_name].to_numpy()
+            if j in categorical_features:
+                numpy_columns.append(np.array(
+                    [hash(value) % 1000 if value != "nan" else 0 for value in column],
+                    dtype=np.float64
+                ))
+            else:
+                numpy_columns.append(np.nan_to_num(column.astype(np.float64), nan=0.0))
+
+        processed_array = np.column_stack(numpy_columns)
+        return model.predict_proba(processed_array)
+
+
+def predict_row_proba(row: list, entry: ModelEntry) -> np.ndarray:
+    """Run predict_proba on one prepared model row."""
+    if isinstance(entry.model, TreeEvaluator):
+        return entry.model.predict_proba([row])
+    from catboost import Pool
+
+    return entry.model.predict_proba(Pool([row], cat_features=entry.cat_indices))
+
+
+def explanation_cache_key(cache_key: str) -> str:
+    """Cache key for a row's explanation, stored next to its prediction."""
+    return f"{cache_key}:explanation"
+
+
+def explain_frame(df: pd.DataFrame, entry: ModelEntry) -> List[dict]:
+    """SHAP explanation for every row of a prepared feature frame, in one batched call.
+
+    Contributions are in log-odds of the dropout class, so positive values push a
+    student towards dropout, and base_value plus all contributions is the model's
+    dropout log-odds. Every feature is kept, largest absolute contribution first,
+    so one cached explanation serves any top_k.
+    """
+    from catboost import Pool
+
+    shap_values = entry.model.get_feature_importance(
+        data=Pool(df, cat_features=entry.cat_indices), type='ShapValues',
+        shap_calc_type=EXPLANATION_SHAP_CALC_TYPE
+    )
+    actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+    if shap_values.ndim == 3:
+        # Multiclass models return one set of values per class
+        shap_values = shap_values[:, actual_classes.index('dropout'), :]
+    elif actual_classes[1] != 'dropout':
+        # Binary SHAP values explain the second class
+        shap_values = -shap_values
+
+    contributions = shap_values[:, :-1]
+    order = np.argsort(-np.abs(contributions), axis=1, kind='stable')
+    feature_names = list(df.columns)
+    explanations = []
+    for values, row_contributions, row_order, base_value in zip(
+            df.to_numpy(dtype=object).tolist(), contributions.tolist(), order.tolist(), shap_values[:, -1].tolist()):
+        explanations.append({
+            'base_value': base_value,
+            'features': [
+                {
+                    'feature': feature_names[j],
+                    'value': None if values[j] == "nan" or (isinstance(values[j], float) and np.isnan(values[j])) else values[j],
+                    'contribution': row_contributions[j]
+                }
+                for j in row_order
+            ]
+        })
+    return explanations
+
+
+def explain_batch(cache_keys: List[str], n_rows: int, build_frame, entry: ModelEntry, endpoint: str) -> List[dict]:
+    """Explanation per row, from the prediction cache where possible.
+
+    cache_keys are the rows' prediction cache keys (empty when caching is off) and
+    build_frame(positions) returns the feature frame for the rows still to explain.
+    """
+    keys = [explanation_cache_key(key) for key in cache_keys]
+    cached = prediction_cache.get_many(keys) if keys else {}
+    misses = [i for i in range(n_rows) if not keys or keys[i] not in cached]
+
+    explained = {}
+    if misses:
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="explain"):
+            explained = dict(zip(misses, explain_frame(build_frame(misses), entry)))
+        if keys:
+            prediction_cache.set_many({keys[i]: explained[i] for i in misses})
+    return [explained[i] if i in explained else cached[keys[i]] for i in range(n_rows)]
+
+
+def top_explanation(explanation: dict, top_k: int) -> dict:
+    """The response form of an explanation: its top_k features by absolute contribution."""
+    return {'base_value': explanation['base_value'], 'top_features': explanation['features'][:top_k]}
+
+# Inference worker pool
+class InferenceError(Exception):
+    """Scoring failure raised inside the inference pool.
+
+    HTTPException cannot be pickled back from process workers, so pool functions
+    raise this instead and run_inference converts it.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class InferenceUnavailable(HTTPException):
+    """429/503 from run_inference for work that never ran or died with its worker.
+
+    Unlike a timeout, the work is not still running, so it is safe to submit again.
+    """
+
+
+inference_executor = None
+inference_pending = 0
+inference_pending_lock = threading.Lock()
+
+
+def get_inference_executor():
+    """Create the inference pool on first use so process workers fork after the model is loaded."""
+    global inference_executor
+    if inference_executor is None:
+        if INFERENCE_POOL == "process":
+            inference_executor = ProcessPoolExecutor(
+                max_workers=INFERENCE_WORKERS,
+                mp_context=multiprocessing.get_context("fork")
+            )
+        else:
+            inference_executor = ThreadPoolExecutor(
+                max_workers=INFERENCE_WORKERS,
+                thread_name_prefix="inference"
+            )
+        logger.info(f"Inference pool started: {INFERENCE_POOL} x {INFERENCE_WORKERS}")
+    return inference_executor
+
+
+def run_in_worker(submitted_at: float, func, *args):
+    """Pool entry point: records the queue wait and runs func.
+
+    Metrics recorded inside a process worker would stay in that process, so there
+    they are captured and returned with the result for the parent to replay.
+    """
+    if INFERENCE_POOL != "process":
+        metrics.observe("inference_queue_wait_seconds", time.monotonic() - submitted_at)
+        return func(*args)
+
+    with metrics.capture() as observations:
+        metrics.observe("inference_queue_wait_seconds", time.monotonic() - submitted_at)
+        result = func(*args)
+    return result, observations
+
+
+def _release_inference_slot(_future):
+    global inference_pending
+    with inference_pending_lock:
+        inference_pending -= 1
+
+
+async def run_inference(func, *args):
+    """Run a blocking scoring function in the inference pool.
+
+    Rejects with 429 when INFERENCE_MAX_PENDING jobs are already queued or running,
+    and with 503 when the job does not finish within INFERENCE_TIMEOUT_SECONDS.
+    """
+    global inference_pending
+    with inference_pending_lock:
+        if inference_pending >= INFERENCE_MAX_PENDING:
+            metrics.inc("prediction_errors_total", type="queue_full")
+            raise InferenceUnavailable(
+                status_code=429,
+                detail="Inference queue is full, please retry later",
+                headers={"Retry-After": "1"}
+            )
+        inference_pending += 1
+
+    try:
+        job = get_inference_executor().submit(run_in_worker, time.monotonic(), func, *args)
+    except Exception as e:
+        with inference_pending_lock:
+            inference_pending -= 1
+        if isinstance(e, BrokenProcessPool):
+            raise workers_unavailable()
+        raise
+    # The slot is held until the worker actually finishes, even if the caller times out
+    job.add_done_callback(_release_inference_slot)
+
+    try:
+        result = await asyncio.wait_for(asyncio.wrap_future(job), timeout=INFERENCE_TIMEOUT_SECONDS)
+    except InferenceError as e:
+        metrics.inc("prediction_errors_total", type="prediction_failed")
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except asyncio.TimeoutError:
+        metrics.inc("prediction_errors_total", type="timeout")
+        logger.warning("Inference timed out after %ss", INFERENCE_TIMEOUT_SECONDS)
+        raise HTTPException(
+            status_code=503,
+            detail="Inference timed out, please retry later",
+            headers={"Retry-After": "1"}
+        )
+    except BrokenProcessPool:
+        raise workers_unavailable()
+
+    if INFERENCE_POOL == "process":
+        result, observations = result
+        metrics.replay(observations)
+    return result
+
+
+def workers_unavailable() -> InferenceUnavailable:
+    """Drop a broken process pool, so the next call starts a new one."""
+    metrics.inc("prediction_errors_total", type="workers_unavailable")
+    logger.error("Inference process pool is broken, restarting it")
+    shutdown_inference_executor()
+    return InferenceUnavailable(status_code=503, detail="Inference workers unavailable, please retry later")
+
+
+def shutdown_inference_executor():
+    global inference_executor
+    if inference_executor is not None:
+        inference_executor.shutdown(wait=False, cancel_futures=True)
+        inference_executor = None
+
+# Micro-batcher for single predictions
+class MicroBatcher:
+    """Collects concurrent /predict requests and scores them with one batch call.
+
+    A batch is flushed when max_batch_size requests are waiting or window_seconds
+    after the first request arrived, whichever comes first. Each caller gets back
+    the same response /predict would have returned for its request alone.
+    """
+
+    def __init__(self, window_seconds: float, max_batch_size: int):
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.pending = []
+        self.flush_handle = None
+
+    async def submit(self, data: PredictionRequest, entry: ModelEntry, explain_top_k: int = 0):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((data, entry, explain_top_k, future))
+
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window_seconds, self.flush)
+
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+
+        batch, self.pending = self.pending, []
+
+        # Requests routed to different models or asking for different explanations are scored separately
+        groups = {}
+        for data, entry, explain_top_k, future in batch:
+            groups.setdefault((id(entry), explain_top_k), (entry, explain_top_k, []))[2].append((data, future))
+        for entry, explain_top_k, items in groups.values():
+            asyncio.ensure_future(self.score(entry, explain_top_k, items))
+
+    async def score(self, entry: ModelEntry, explain_top_k: int, batch):
+        try:
+            response = await run_inference(
+                predict_batch, [data for data, _ in batch], entry, "/predict", False, explain_top_k
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, response['predictions']):
+            result.pop('index', None)
+            if not future.done():
+                future.set_result(result)
+
+
+micro_batcher = MicroBatcher(MICROBATCH_WINDOW_MS / 1000.0, MICROBATCH_MAX_SIZE) if PREDICT_MICROBATCH else None
+
+# Shadow scoring, off the request path
+def score_shadow(entry: ModelEntry, rows) -> List[str]:
+    """Predicted class per row (PredictionRequests or a ColumnarBatch) from the shadow model; results are never cached or returned."""
+    if isinstance(rows, ColumnarBatch):
+        df = prepare_column_frame(rows.columns, len(rows), entry)
+    else:
+        df = prepare_feature_frame(rows, entry)
+    probabilities = predict_frame_proba(df, entry)
+    actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+    return [actual_classes[i] for i in np.argmax(probabilities, axis=1)]
+
+
+shadow_scorer = ShadowScorer(score_shadow, SHADOW_MAX_PENDING)
+
+
+def submit_shadow(entry: ModelEntry, rows, predicted_classes: List[str]):
+    shadow = model_registry.shadow()
+    if shadow is not None and shadow is not entry:
+        shadow_scorer.submit(shadow, rows, predicted_classes)
+
+
+def route_model() -> ModelEntry:
+    entry = model_registry.route()
+    if entry is None:
+        metrics.inc("prediction_errors_total", type="model_unavailable")
+        raise HTTPException(status_code=503, detail="Model not loaded. Please check the service status.")
+    return entry
+
+
+def require_explanations(entry: Optional[ModelEntry]):
+    """SHAP explanations need the CatBoost model itself, not exported tree arrays."""
+    if entry is not None and isinstance(entry.model, TreeEvaluator):
+        raise HTTPException(status_code=409, detail="Explanations need MODEL_BACKEND=catboost")
+
 # Single prediction endpoint
 @app.post("/predict")
-async def predict(data: PredictionRequest):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded. Please check the service status.")
-    
-    user_data = data.userData
+async def predict(data: PredictionRequest, request: Request, response: Response, explain: bool = False,
+                  top_k: int = Query(EXPLANATION_TOP_K, ge=1)):
+    """Score one student; explain=true adds the top_k features behind the prediction."""
+    observe_parse_stage(request, "/predict")
+    entry = route_model()
+    explain_top_k = top_k if explain else 0
+    if explain:
+        require_explanations(entry)
 
-    # Log user data if provided
-    if user_data:
-        user_info = user_data.model_dump(exclude_unset=True)
-        logger.info(f"User data received: {user_info}")
+    if micro_batcher is not None:
+        result = await micro_batcher.submit(data, entry, explain_top_k)
     else:
-        logger.info("No user data provided")
+        result = await run_inference(predict_one, data, entry, explain_top_k)
+
+    response.headers["X-Model-Version"] = f"{entry.name}@{entry.version}"
+    submit_shadow(entry, [data], [result['prediction']])
+    return result
+
+
+def predict_one(data: PredictionRequest, entry: ModelEntry, explain_top_k: int = 0):
+    """Score a single request synchronously; runs inside the inference pool.
+
+    explain_top_k > 0 adds an explanation with that many features (see explain_frame).
+    """
+    user_data = data.userData
+    # Per-request detail only for a sample of requests, and only at DEBUG level
+    log_detail = sampled_debug(logger)
 
-    # Get correct feature names
-    feature_names = get_feature_names()
-    
     try:
-        # Get categorical features from model
-        categorical_features = model_metadata.get('categorical_features', [])
-        
-        # Prepare features from request
-        features = prepare_features(data)
-        
-        # Log the raw features for debugging
-        logger.info(f"Raw features received: {features[:5]}...")  # Log first 5 for brevity
-        logger.info(f"Categorical feature indices: {categorical_features}")
-        
-        # Process features - be more careful with type conversion
-        processed_features = []
-        for i, feature_value in enumerate(features):
-            if i in categorical_features:
-                # For categorical features, ensure they're handled properly
-                if pd.isna(feature_value) or feature_value is None:
-                    processed_features.append("nan")  # CatBoost can handle string "nan"
-                else:
-                    processed_features.append(str(feature_value))
-            else:
-                # For numerical features, ensure they're floats
-                try:
-                    if pd.isna(feature_value) or feature_value is None:
-                        processed_features.append(np.nan)
-                    else:
-                        processed_features.append(float(feature_value))
-                except (ValueError, TypeError):
-                    logger.warning(f"Could not convert feature {i} to float, using NaN")
-                    processed_features.append(np.nan)
-        
-        logger.info(f"Processed features: {processed_features[:5]}...")  # Log first 5 for brevity
-        
-        # Create DataFrame with correct feature names
-        df = pd.DataFrame([processed_features], columns=feature_names)
-
-        expected_cols = model_metadata.get('feature_names', [])
-        df = df[expected_cols]
-        
-        logger.info(f"DataFrame shape: {df.shape}")
-        logger.info(f"DataFrame columns: {list(df.columns)}")
-        logger.info(f"First few values: {df.iloc[0, :5].tolist()}")
-        
-        # Make prediction
+        # Build the model row directly in model column order, no DataFrame needed
+        with metrics.timer(STAGE_METRIC, endpoint="/predict", stage="prepare_features"):
+            row = prepare_model_row(data, entry)
+        if log_detail:
+            logger.debug("Prediction request", extra={
+                'userData': user_data.model_dump(exclude_unset=True) if user_data else None,
+                'features': row[:5]  # first 5 for brevity
+            })
+
+        with metrics.timer(STAGE_METRIC, endpoint="/predict", stage="cache_lookup"):
+            cache_key = prediction_cache_key(row, entry) if prediction_cache.enabled else None
+            cached = prediction_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            if log_detail:
+                logger.debug("✅ Prediction served from cache: %s", cached['prediction'])
+            metrics.inc("prediction_rows_total", source="cache")
+            response = attach_request_fields(cached, user_data)
+            if explain_top_k:
+                response['explanation'] = explain_one(row, cache_key, entry, explain_top_k)
+            return response
+
+        # Make prediction; the class is the argmax of the probabilities
+        model = entry.model
+        predict_started = time.perf_counter()
         try:
-            prediction = model.predict(df)
-            probabilities = model.predict_proba(df)
-            
-            logger.info(f"Raw prediction: {prediction}")
-            logger.info(f"Raw probabilities shape: {probabilities.shape}")
-            
+            probabilities = predict_row_proba(row, entry)
         except Exception as pred_error:
-            logger.error(f"Prediction failed: {str(pred_error)}")
-            
+            if isinstance(model, TreeEvaluator):
+                raise
             # Try alternative approach - pass as numpy array
-            logger.info("Trying alternative prediction method with numpy array...")
-            
+            logger.error("Prediction failed, trying numpy array: %s", pred_error)
+            metrics.inc("prediction_numpy_fallback_total", path="single")
+
             # Convert categorical features for numpy array approach
             numpy_features = []
-            for i, feature_value in enumerate(processed_features):
-                if i in categorical_features:
-                    if isinstance(feature_value, str) and feature_value != "nan":
-                        # Convert categorical strings to integers for numpy approach
-                        try:
-                            numpy_features.append(hash(feature_value) % 1000)  # Simple hash to int
-                        except:
-                            numpy_features.append(0)
-                    else:
-                        numpy_features.append(0)
+            for (_, categorical), feature_value in zip(entry.feature_plan, row):
+                if categorical:
+                    # Convert categorical strings to integers for numpy approach
+                    numpy_features.append(hash(feature_value) % 1000 if feature_value != "nan" else 0)
                 else:
                     numpy_features.append(feature_value if not pd.isna(feature_value) else 0.0)
-            
-            processed_array = np.array(numpy_features).reshape(1, -1)
-            prediction = model.predict(processed_array)
+
+            processed_array = np.array(numpy_features, dtype=np.float64).reshape(1, -1)
             probabilities = model.predict_proba(processed_array)
+        metrics.observe(STAGE_METRIC, time.perf_counter() - predict_started, endpoint="/predict", stage="predict_proba")
+        metrics.inc("prediction_rows_total", source="model")
 
-        # Use actual model classes
-        actual_classes = model_metadata.get('classes', ['dropout', 'not_dropout'])
-        
-        # Create class mapping
-        class_mapping = {}
-        for i, class_name in enumerate(actual_classes):
-            class_mapping[i] = class_name
-
-        predicted_class = class_mapping.get(prediction[0], 'Unknown')
-
-        response = {
-            'prediction': predicted_class,
-            'probabilities': {
-                class_mapping[i]: float(probabilities[0][i])
-                for i in range(len(actual_classes))
-            },
-            'confidence': float(np.max(probabilities[0])),
-            'risk_level': 'High Risk' if predicted_class == 'dropout' and np.max(probabilities[0]) > 0.7 else 
-                        'Medium Risk' if predicted_class == 'dropout' else 'Low Risk'
-        }
+        with metrics.timer(STAGE_METRIC, endpoint="/predict", stage="format_response"):
+            result = build_prediction_result(probabilities[0], entry)
+            if cache_key:
+                prediction_cache.set(cache_key, result)
 
-        # Include user data in response if provided
-        if user_data:
-            response['userData'] = user_data.model_dump(exclude_unset=True)
+            response = attach_request_fields(result, user_data)
+        if explain_top_k:
+            response['explanation'] = explain_one(row, cache_key, entry, explain_top_k)
 
-        logger.info(f"✅ Prediction made: {predicted_class} (confidence: {response['confidence']:.3f})")
+        if log_detail:
+            logger.debug("✅ Prediction made: %s (confidence: %.3f)", response['prediction'], response['confidence'])
         return response
 
     except Exception as e:
-        logger.error(f"❌ Prediction error: {str(e)}")
-        logger.error(f"Error type: {type(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        logger.exception("❌ Prediction error: %s", e)
+        raise InferenceError(500, f"Prediction failed: {str(e)}")
+
+def explain_one(row: list, cache_key: Optional[str], entry: ModelEntry, top_k: int) -> dict:
+    """Explanation for a single prepared model row."""
+    explanations = explain_batch(
+        [cache_key] if cache_key else [], 1,
+        lambda _: pd.DataFrame([row], columns=get_feature_names(entry)), entry, "/predict"
+    )
+    return top_explanation(explanations[0], top_k)
 
 # Batch prediction endpoint
-@app.post("/batch-predict")
-async def batch_predict(batch_data: BatchPredictionRequest):
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
-    
-    if len(batch_data.predictions) > 100:
-        raise HTTPException(status_code=400, detail="Maximum 100 predictions per batch request")
+def request_rows_to_batch(rows: List[PredictionRequest]) -> ColumnarBatch:
+    """Turn validated request rows into a ColumnarBatch, so they can be scored column-wise.
 
+    Plain value lists build the same feature frame as the validated arrays do.
+    """
+    columns = {spec.name: [getattr(row, spec.name) for row in rows] for spec in REQUEST_COLUMN_SPECS}
+    user_columns = {}
+    for name in USER_DATA_COLUMN_CHECKS:
+        values = [getattr(row.userData, name) if row.userData else None for row in rows]
+        if any(value is not None for value in values):
+            user_columns[name] = values
+    return ColumnarBatch(columns, len(rows), user_columns)
+
+
+def parse_batch_body(body: bytes, content_type: str):
+    """Parse a /batch-predict body into PredictionRequests, or a ColumnarBatch for columnar payloads.
+
+    JSON bodies are either {"predictions": [row, ...]} or {"columns": {field: [value, ...]}}.
+    msgpack bodies use the same columns layout; Arrow IPC streams carry one column per field.
+    Validation errors are reported like FastAPI's own 422 responses.
+    """
+    if content_type in MSGPACK_CONTENT_TYPES + ARROW_CONTENT_TYPES:
+        try:
+            columns = decode_columns(body, content_type)
+        except ImportError:
+            raise HTTPException(status_code=415, detail=f"{content_type} support is not installed on this server")
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Could not decode {content_type} body: {str(e)}")
+    elif content_type in ("application/json", ""):
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise RequestValidationError([{
+                'type': 'json_invalid', 'loc': ('body', getattr(e, 'pos', 0)),
+                'msg': 'JSON decode error', 'input': {}, 'ctx': {'error': str(e)}
+            }])
+        if not (isinstance(payload, dict) and 'columns' in payload):
+            try:
+                return BatchPredictionRequest.model_validate(payload).predictions
+            except ValidationError as e:
+                raise RequestValidationError([
+                    {**error, 'loc': ('body', *error['loc'])} for error in e.errors(include_url=False)
+                ])
+        columns = payload['columns']
+    else:
+        raise HTTPException(status_code=415, detail="Content-Type must be application/json, application/msgpack or application/vnd.apache.arrow.stream")
+
+    batch, errors = validate_columns(columns, REQUEST_COLUMN_SPECS, USER_DATA_COLUMN_CHECKS)
+    if errors:
+        raise RequestValidationError([
+            {'type': 'value_error', 'loc': ('body', 'columns', *loc), 'msg': message, 'input': None}
+            for loc, message in errors
+        ])
+    return batch
+
+
+@app.post("/batch-predict", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"$ref": "#/components/schemas/BatchPredictionRequest"}},
+    MSGPACK_CONTENT_TYPES[0]: {"schema": {"type": "string", "format": "binary"}},
+    ARROW_CONTENT_TYPES[0]: {"schema": {"type": "string", "format": "binary"}}
+}}})
+async def batch_predict(request: Request, response_format: Optional[str] = None, compact: bool = False,
+                        incremental: bool = False, explain: bool = False,
+                        top_k: int = Query(EXPLANATION_TOP_K, ge=1)):
+    """Score a batch given as rows or columns.
+
+    Columnar input gets a columnar response ({"columns": {...}, "count": n}) unless
+    response_format=rows; row input can ask for response_format=columnar. A columnar
+    response is sent as msgpack or Arrow IPC when the Accept header asks for it.
+    compact=true returns parallel arrays instead (see compact_result_columns).
+    With incremental=true only students whose features or the model changed since
+    their last scoring are run through the model (see predict_batch). explain=true
+    adds the top_k features behind each prediction.
+    """
+    entry = route_model()
+    explain_top_k = top_k if explain else 0
+    if explain:
+        require_explanations(entry)
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    batch = parse_batch_body(await request.body(), content_type)
+    observe_parse_stage(request, "/batch-predict")
+
+    if len(batch) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_SIZE} predictions per batch request")
+    if response_format not in (None, "rows", "columnar"):
+        raise HTTPException(status_code=400, detail="response_format must be 'rows' or 'columnar'")
+    if compact and response_format is not None:
+        raise HTTPException(status_code=400, detail="compact cannot be combined with response_format")
+
+    # Results are returned as encoded responses, skipping FastAPI's per-value jsonable_encoder pass
+    headers = {"X-Model-Version": f"{entry.name}@{entry.version}"}
+    if compact and not isinstance(batch, ColumnarBatch):
+        # Compact output never needs per-row results, so score the rows column-wise
+        batch = request_rows_to_batch(batch)
+    if isinstance(batch, ColumnarBatch):
+        columns = await run_inference(predict_columns, batch, entry, incremental, explain_top_k)
+        submit_shadow(entry, batch, columns['prediction'])
+        if compact:
+            return FastJSONResponse(compact_result_columns(columns, entry), headers=headers)
+        if response_format == "rows":
+            return FastJSONResponse({'predictions': prediction_columns_to_rows(columns)}, headers=headers)
+    else:
+        result = await run_inference(predict_batch, batch, entry, "/batch-predict", incremental, explain_top_k)
+        submit_shadow(entry, batch, [prediction['prediction'] for prediction in result['predictions']])
+        if response_format != "columnar":
+            return FastJSONResponse(result, headers=headers)
+        columns = prediction_rows_to_columns(result['predictions'], entry)
+
+    accept = request.headers.get("accept", "").split(",")[0].split(";")[0].strip().lower()
+    if accept in MSGPACK_CONTENT_TYPES + ARROW_CONTENT_TYPES:
+        try:
+            content = encode_columns(columns, accept)
+        except ImportError:
+            raise HTTPException(status_code=406, detail=f"{accept} support is not installed on this server")
+        return Response(content=content, media_type=accept, headers=headers)
+    return FastJSONResponse({'columns': columns, 'count': len(columns['prediction'])}, headers=headers)
+
+
+def service_openapi():
+    """OpenAPI schema, plus the BatchPredictionRequest schema that /batch-predict parses itself."""
+    if app.openapi_schema is None:
+        schema = get_openapi(title=app.title, version=app.version, description=app.description, routes=app.routes)
+        batch_schema = BatchPredictionRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+        components = schema.setdefault("components", {}).setdefault("schemas", {})
+        components.update(batch_schema.pop("$defs", {}))
+        components["BatchPredictionRequest"] = batch_schema
+        app.openapi_schema = schema
+    return app.openapi_schema
+
+
+app.openapi = service_openapi
+
+
+def predict_batch(rows: List[PredictionRequest], entry: ModelEntry, endpoint: str = "/batch-predict",
+                  incremental: bool = False, explain_top_k: int = 0):
+    """Score a batch of requests synchronously; runs inside the inference pool.
+
+    endpoint only labels the stage metrics with the route the rows came from.
+    With incremental, students (by userData.studentId) whose prepared features and
+    model version are unchanged since they were last scored get their stored
+    result, and every result gets a status of "cached" or "rescored".
+    explain_top_k > 0 adds explanations, computed for all uncached rows in one pass.
+    """
     results = []
-    feature_names = get_feature_names()
+    metrics.observe("prediction_batch_size", len(rows), endpoint=endpoint)
 
     try:
-        # Prepare all features for batch prediction
-        all_features = []
-        user_data_list = []
-        categorical_features = model_metadata.get('categorical_features', [])
-        
-        for i, pred_request in enumerate(batch_data.predictions):
-            # Prepare features from request
-            features = prepare_features(pred_request)
-            
-            # Process features (convert categorical to string, numerical to float)
-            processed_features = []
-            for j, feature_value in enumerate(features):
-                if j in categorical_features:
-                    if pd.isna(feature_value) or feature_value is None:
-                        processed_features.append("nan")
-                    else:
-                        processed_features.append(str(feature_value))
-                else:
-                    if pd.isna(feature_value) or feature_value is None:
-                        processed_features.append(np.nan)
-                    else:
-                        try:
-                            processed_features.append(float(feature_value))
-                        except (ValueError, TypeError):
-                            processed_features.append(np.nan)
-            
-            all_features.append(processed_features)
-            user_data_list.append(pred_request.userData)
-
-        # Create DataFrame for batch prediction
-        df = pd.DataFrame(all_features, columns=get_feature_names())
-        expected_cols = model_metadata.get('feature_names', [])
-        df = df[expected_cols]
-
-        
-        # Make batch predictions
-        try:
-            predictions = model.predict(df)
-            probabilities = model.predict_proba(df)
-        except Exception as pred_error:
-            logger.error(f"Batch prediction failed with DataFrame, trying numpy array: {str(pred_error)}")
-            
-            # Convert to numpy array with categorical handling
-            numpy_batch = []
-            for processed_features in all_features:
-                numpy_features = []
-                for j, feature_value in enumerate(processed_features):
-                    if j in categorical_features:
-                        if isinstance(feature_value, str) and feature_value != "nan":
-                            try:
-                                numpy_features.append(hash(feature_value) % 1000)
-                            except:
-                                numpy_features.append(0)
-                        else:
-                            numpy_features.append(0)
-                    else:
-                        numpy_features.append(feature_value if not pd.isna(feature_value) else 0.0)
-                numpy_batch.append(numpy_features)
-            
-            processed_array = np.array(numpy_batch)
-            predictions = model.predict(processed_array)
-            probabilities = model.predict_proba(processed_array)
+        # Look up every row in the student store and cache, only misses go to the model
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="cache_lookup"):
+            cache_keys = [
+                prediction_cache_key(prepare_model_row(row, entry), entry) for row in rows
+            ] if prediction_cache.enabled or incremental else []
+            student_ids = [row.userData.studentId if row.userData else None for row in rows] if incremental else []
+            stored = student_store.lookup(student_ids, cache_keys) if incremental else {}
+            cached = prediction_cache.get_many(
+                [key for i, key in enumerate(cache_keys) if i not in stored]
+            ) if cache_keys else {}
+        miss_positions = [
+            i for i in range(len(rows))
+            if i not in stored and (not cache_keys or cache_keys[i] not in cached)
+        ]
 
-        # Use actual model classes
-        actual_classes = model_metadata.get('classes', ['dropout', 'not_dropout'])
-        class_mapping = {i: class_name for i, class_name in enumerate(actual_classes)}
+        scored = {}
+        probabilities = []
+        df = None
+        if miss_positions:
+            # Create DataFrame for the misses, one typed column per feature
+            with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="build_frame"):
+                df = prepare_feature_frame([rows[i] for i in miss_positions], entry)
+            with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="predict_proba"):
+                probabilities = predict_frame_proba(df, entry)
 
         # Format results
-        for i, (pred, prob) in enumerate(zip(predictions, probabilities)):
-            predicted_class = class_mapping.get(pred, 'Unknown')
-            confidence = float(np.max(prob))
-            
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="format_response"):
+            for i, prob in zip(miss_positions, probabilities):
+                scored[i] = build_prediction_result(prob, entry)
+            if cache_keys and scored:
+                prediction_cache.set_many({cache_keys[i]: result for i, result in scored.items()})
+
+            fresh = {}
+            for i, row in enumerate(rows):
+                if i in stored:
+                    result = stored[i]
+                else:
+                    result = fresh[i] = scored[i] if i in scored else cached[cache_keys[i]]
+                results.append(attach_request_fields(result, row.userData, index=i))
+                if incremental:
+                    results[-1]['status'] = 'cached' if i in stored else 'rescored'
+
+        if explain_top_k:
+            # Reuse the scoring frame when it covers exactly the rows to explain
+            explanations = explain_batch(
+                cache_keys, len(rows),
+                lambda positions: df if positions == miss_positions else
+                prepare_feature_frame([rows[i] for i in positions], entry),
+                entry, endpoint
+            )
+            for result, explanation in zip(results, explanations):
+                result['explanation'] = top_explanation(explanation, explain_top_k)
+
+        if incremental:
+            with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="student_store"):
+                student_store.save({
+                    student_ids[i]: (cache_keys[i], result) for i, result in fresh.items() if student_ids[i]
+                }, entry.version)
+
+        metrics.inc("prediction_rows_total", len(scored), source="model")
+        metrics.inc("prediction_rows_total", len(results) - len(scored) - len(stored), source="cache")
+        metrics.inc("prediction_rows_total", len(stored), source="student_store")
+
+        if sampled_debug(logger):
+            logger.debug("✅ Batch prediction completed: %d predictions (%d scored, %d cached)",
+                         len(results), len(scored), len(results) - len(scored))
+        return {'predictions': results}
+
+    except Exception as e:
+        logger.exception("❌ Batch prediction error: %s", e)
+        raise InferenceError(500, f"Batch prediction failed: {str(e)}")
+
+def predict_columns(batch: ColumnarBatch, entry: ModelEntry, incremental: bool = False,
+                    explain_top_k: int = 0, endpoint: str = "/batch-predict") -> dict:
+    """Score a validated columnar batch synchronously; runs inside the inference pool.
+
+    Returns result columns; no per-row objects are built except to fill the cache
+    and student store. incremental and explain_top_k work as in predict_batch, with
+    status and explanation columns.
+    """
+    n_rows = len(batch)
+    metrics.observe("prediction_batch_size", n_rows, endpoint=endpoint)
+
+    try:
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="build_frame"):
+            df = prepare_column_frame(batch.columns, n_rows, entry)
+
+        # Same keys as the row path, so both formats share cached results
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="cache_lookup"):
+            cache_keys = [
+                prediction_cache_key(row, entry) for row in df.to_numpy(dtype=object).tolist()
+            ] if prediction_cache.enabled or incremental else []
+            student_ids = batch.user_columns.get('studentId', [None] * n_rows) if incremental else []
+            stored = student_store.lookup(student_ids, cache_keys) if incremental else {}
+            cached = prediction_cache.get_many(
+                [key for i, key in enumerate(cache_keys) if i not in stored]
+            ) if cache_keys else {}
+        miss_positions = [
+            i for i in range(n_rows)
+            if i not in stored and (not cache_keys or cache_keys[i] not in cached)
+        ]
+
+        actual_classes = entry.metadata.get('classes', ['dropout', 'not_dropout'])
+        probabilities = np.empty((n_rows, len(actual_classes)), dtype=np.float64)
+        if miss_positions:
+            with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="predict_proba"):
+                miss_frame = df if len(miss_positions) == n_rows else df.iloc[miss_positions]
+                probabilities[miss_positions] = predict_frame_proba(miss_frame, entry)
+
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="format_response"):
+            for i, key in enumerate(cache_keys):
+                previous = stored.get(i) or cached.get(key)
+                if previous is not None:
+                    probabilities[i] = [previous['probabilities'][name] for name in actual_classes]
+            columns = {'index': list(range(n_rows)), **build_result_columns(probabilities, entry)}
+            columns.update(batch.user_columns)
+            if cache_keys and miss_positions:
+                prediction_cache.set_many({
+                    cache_keys[i]: build_prediction_result(probabilities[i], entry) for i in miss_positions
+                })
+            if incremental:
+                columns['status'] = ['cached' if i in stored else 'rescored' for i in range(n_rows)]
+
+        if explain_top_k:
+            explanations = explain_batch(
+                cache_keys, n_rows, lambda positions: df if len(positions) == n_rows else df.iloc[positions],
+                entry, endpoint
+            )
+            columns['explanation'] = [top_explanation(explanation, explain_top_k) for explanation in explanations]
+
+        if incremental:
+            with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="student_store"):
+                student_store.save({
+                    student_ids[i]: (cache_keys[i], build_prediction_result(probabilities[i], entry))
+                    for i in range(n_rows) if student_ids[i] and i not in stored
+                }, entry.version)
+
+        metrics.inc("prediction_rows_total", len(miss_positions), source="model")
+        metrics.inc("prediction_rows_total", n_rows - len(miss_positions) - len(stored), source="cache")
+        metrics.inc("prediction_rows_total", len(stored), source="student_store")
+        return columns
+
+    except Exception as e:
+        logger.exception("❌ Columnar batch prediction error: %s", e)
+        raise InferenceError(500, f"Batch prediction failed: {str(e)}")
+
+# Cohort risk aggregation endpoint
+AGGREGATE_GROUP_FIELDS = ('department', 'admission_type', 'residence_type', 'scholarship_status')
+
+
+def risk_aggregates(group_ids: np.ndarray, n_groups: int, dropout_probability: np.ndarray, risk_codes: np.ndarray,
+                    n_bins: int) -> List[dict]:
+    """Risk-tier counts, mean dropout probability and a probability histogram per group id."""
+    counts = np.bincount(group_ids, minlength=n_groups)
+    sums = np.bincount(group_ids, weights=dropout_probability, minlength=n_groups)
+    risk_counts = np.bincount(group_ids * len(RISK_LEVELS) + risk_codes,
+                              minlength=n_groups * len(RISK_LEVELS)).reshape(n_groups, len(RISK_LEVELS))
+    # The last bin is closed, so a probability of exactly 1 lands in it
+    bins = np.minimum((dropout_probability * n_bins).astype(np.int64), n_bins - 1)
+    histograms = np.bincount(group_ids * n_bins + bins, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+    return [
+        {
+            'count': count,
+            'risk_counts': dict(zip(RISK_LEVELS, tier_counts)),
+            'mean_dropout_probability': total / count if count else None,
+            'histogram': histogram
+        }
+        for count, total, tier_counts, histogram in zip(
+            counts.tolist(), sums.tolist(), risk_counts.tolist(), histograms.tolist())
+    ]
+
+
+def aggregate_cohort(batch: ColumnarBatch, entry: ModelEntry, group_by: Optional[str], n_bins: int,
+                     incremental: bool = False) -> dict:
+    """Score a cohort (through the cache and student store) and aggregate it; runs inside the inference pool.
+
+    Only the aggregates leave the pool. Groups are ordered by value, with missing values last.
+    """
+    endpoint = "/cohort-risk"
+    columns = predict_columns(batch, entry, incremental, 0, endpoint)
+
+    try:
+        with metrics.timer(STAGE_METRIC, endpoint=endpoint, stage="aggregate"):
+            dropout_probability = np.asarray(columns['probability_dropout'], dtype=np.float64)
+            risk_codes = pd.Categorical(columns['risk_level'], categories=RISK_LEVELS).codes.astype(np.int64)
+
             result = {
-                'prediction': predicted_class,
-                'probabilities': {
-                    class_mapping[j]: float(prob[j])
-                    for j in range(len(actual_classes))
-                },
-                'confidence': confidence,
-                'risk_level': 'High Risk' if predicted_class == 'dropout' and confidence > 0.7 else 
-                            'Medium Risk' if predicted_class == 'dropout' else 'Low Risk',
-                'index': i
+                'count': len(batch),
+                'group_by': group_by,
+                'risk_levels': RISK_LEVELS,
+                'histogram_edges': [i / n_bins for i in range(n_bins + 1)],
+                'overall': risk_aggregates(np.zeros(len(batch), dtype=np.int64), 1, dropout_probability,
+                                           risk_codes, n_bins)[0]
             }
-            
-            if user_data_list[i]:
-                result['userData'] = user_data_list[i].model_dump(exclude_unset=True)
-            
-            results.append(result)
+            if group_by:
+                group_ids, values = pd.factorize(pd.Series(batch.columns[group_by], dtype=object), sort=True)
+                # Columnar integer fields hold numpy ints, which the standard JSON encoder rejects
+                values = [value.item() if isinstance(value, np.generic) else value for value in values.tolist()]
+                if (group_ids < 0).any():
+                    # Missing values are factorized to -1; give them their own last group
+                    group_ids = np.where(group_ids < 0, len(values), group_ids)
+                    values.append(None)
+                groups = risk_aggregates(group_ids.astype(np.int64), len(values), dropout_probability,
+                                         risk_codes, n_bins)
+                result['groups'] = [{'value': value, **group} for value, group in zip(values, groups)]
+        return result
 
-        logger.info(f"✅ Batch prediction completed: {len(results)} predictions")
-        return {'predictions': results}
+    except Exception as e:
+        logger.exception("❌ Cohort aggregation error: %s", e)
+        raise InferenceError(500, f"Cohort aggregation failed: {str(e)}")
+
+
+@app.post("/cohort-risk", openapi_extra={"requestBody": {"required": True, "content": {
+    "application/json": {"schema": {"$ref": "#/components/schemas/BatchPredictionRequest"}},
+    MSGPACK_CONTENT_TYPES[0]: {"schema": {"type": "string", "format": "binary"}},
+    ARROW_CONTENT_TYPES[0]: {"schema": {"type": "string", "format": "binary"}}
+}}})
+async def cohort_risk(request: Request, group_by: Optional[str] = None, bins: int = Query(10, ge=1, le=100),
+                      incremental: bool = False):
+    """Risk aggregates for a cohort sent like a /batch-predict body, overall and per group_by value.
+
+    Each aggregate has risk-tier counts, the mean dropout probability and a histogram
+    of dropout probabilities over bins equal-width bins (edges in histogram_edges).
+    """
+    entry = route_model()
+    if group_by is not None and group_by not in AGGREGATE_GROUP_FIELDS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(AGGREGATE_GROUP_FIELDS)}")
+    if 'dropout' not in entry.metadata.get('classes', ['dropout', 'not_dropout']):
+        raise HTTPException(status_code=409, detail="The active model has no 'dropout' class to aggregate")
+
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    batch = parse_batch_body(await request.body(), content_type)
+    observe_parse_stage(request, "/cohort-risk")
+    if len(batch) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_SIZE} students per cohort request")
+    if not isinstance(batch, ColumnarBatch):
+        batch = request_rows_to_batch(batch)
 
+    result = await run_inference(aggregate_cohort, batch, entry, group_by, bins, incremental)
+    return FastJSONResponse(result, headers={"X-Model-Version": f"{entry.name}@{entry.version}"})
+
+# Streaming bulk prediction endpoint
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+CSV_USER_DATA_FIELDS = ("name", "email", "studentId")
+
+
+def parse_stream_record(line: str, input_format: str, csv_header: Optional[List[str]]) -> dict:
+    """Turn one NDJSON line or CSV row into a PredictionRequest payload."""
+    if input_format == "ndjson":
+        return json.loads(line)
+
+    values = next(csv.reader([line]))
+    if len(values) != len(csv_header):
+        raise ValueError(f"Expected {len(csv_header)} CSV columns, got {len(values)}")
+
+    # Empty cells are treated as missing values
+    record = {name: value for name, value in zip(csv_header, values) if value != ""}
+    user_data = {name: record.pop(name) for name in CSV_USER_DATA_FIELDS if name in record}
+    if user_data:
+        record['userData'] = user_data
+    return record
+
+
+def score_stream_records(lines: List[str], input_format: str, csv_header: Optional[List[str]], start_index: int,
+                         entry: ModelEntry, endpoint: str = "/batch-predict/stream", incremental: bool = False,
+                         explain_top_k: int = 0) -> List[dict]:
+    """Validate and score one chunk of NDJSON lines or CSV rows.
+
+    Returns one result per input row, in input order. Rows that fail to parse or
+    validate get an inline error instead of a prediction.
+    """
+    output = [None] * len(lines)
+    valid_rows = []
+    valid_offsets = []
+
+    for offset, line in enumerate(lines):
+        index = start_index + offset
+        try:
+            record = parse_stream_record(line, input_format, csv_header)
+            valid_rows.append(PredictionRequest.model_validate(record))
+            valid_offsets.append(offset)
+        except ValidationError as e:
+            metrics.inc("prediction_errors_total", type="stream_row_invalid")
+            output[offset] = {
+                'index': index,
+                'error': 'Validation failed',
+                'detail': [{'loc': list(err['loc']), 'msg': err['msg']} for err in e.errors()]
+            }
+        except ValueError as e:
+            metrics.inc("prediction_errors_total", type="stream_row_invalid")
+            output[offset] = {'index': index, 'error': f"Could not parse row: {str(e)}"}
+
+    if valid_rows:
+        response = predict_batch(valid_rows, entry, endpoint, incremental, explain_top_k)
+        for offset, result in zip(valid_offsets, response['predictions']):
+            result['index'] = start_index + offset
+            output[offset] = result
+
+    return output
+
+
+def score_stream_chunk(lines: List[str], input_format: str, csv_header: Optional[List[str]], start_index: int,
+                       entry: ModelEntry) -> str:
+    """Score one chunk of streamed rows as NDJSON text; runs inside the inference pool."""
+    output = score_stream_records(lines, input_format, csv_header, start_index, entry)
+    return "".join(json_line(result) for result in output)
+
+
+def stream_input_format(content_type: str) -> Optional[str]:
+    """"csv" or "ndjson" for a bulk-upload content type, None for anything else."""
+    if content_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if content_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    return None
+
+
+async def spool_request_body(request: Request):
+    """Copy the request body into a spool that spills to disk when large, so memory stays bounded."""
+    spool = tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_BYTES)
+    async for body_chunk in request.stream():
+        spool.write(body_chunk)
+    spool.seek(0)
+    return spool
+
+
+def spooled_lines(spool, input_format: str) -> Tuple[Optional[List[str]], Iterator[str]]:
+    """The CSV header (None for NDJSON or an empty body) and an iterator over the non-empty data lines."""
+    text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+    lines = (line.rstrip("\r\n") for line in text)
+    lines = (line for line in lines if line.strip())
+
+    csv_header = None
+    if input_format == "csv":
+        header_line = next(lines, None)
+        if header_line is not None:
+            csv_header = [name.strip() for name in next(csv.reader([header_line]))]
+    return csv_header, lines
+
+
+async def score_stream_chunk_with_retry(chunk: List[str], input_format: str, csv_header: Optional[List[str]],
+                                        start_index: int, entry: ModelEntry) -> str:
+    """Score a streamed chunk in the inference pool, waiting with backoff while it is full or restarting.
+
+    Only InferenceUnavailable is retried, until STREAM_RETRY_SECONDS have passed. A
+    timed-out chunk is still running on a worker, so its 503 fails the stream at once.
+    """
+    deadline = time.monotonic() + STREAM_RETRY_SECONDS
+    delay = 0.05
+    while True:
+        try:
+            return await run_inference(score_stream_chunk, chunk, input_format, csv_header, start_index, entry)
+        except InferenceUnavailable:
+            if time.monotonic() + delay > deadline:
+                raise
+        metrics.inc("stream_chunk_retries_total")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 2.0)
+
+
+async def stream_predictions(spool, input_format: str, entry: ModelEntry):
+    """Read spooled rows chunk by chunk and yield NDJSON results as each chunk is scored."""
+    try:
+        csv_header, lines = spooled_lines(spool, input_format)
+        if input_format == "csv" and csv_header is None:
+            return
+
+        index = 0
+        while True:
+            chunk = list(itertools.islice(lines, STREAM_CHUNK_SIZE))
+            if not chunk:
+                break
+
+            try:
+                yield await score_stream_chunk_with_retry(chunk, input_format, csv_header, index, entry)
+            except HTTPException as e:
+                # The response has already started; aborting it is the only way to report
+                # a failed chunk without it passing for rows with inline errors
+                logger.error("Streaming prediction aborted at row %d: %s", index, e.detail)
+                raise
+            index += len(chunk)
+
+        logger.info("✅ Streaming prediction completed: %d rows", index)
+    finally:
+        spool.close()
+
+
+@app.post("/batch-predict/stream")
+async def batch_predict_stream(request: Request):
+    """Score an NDJSON or CSV body of PredictionRequest rows and stream NDJSON results."""
+    entry = route_model()
+
+    content_type = request.headers.get("content-type", NDJSON_CONTENT_TYPES[0]).split(";")[0].strip().lower()
+    input_format = stream_input_format(content_type)
+    if input_format is None:
+        raise HTTPException(status_code=415, detail="Content-Type must be application/x-ndjson or text/csv")
+
+    spool = await spool_request_body(request)
+    return StreamingResponse(
+        stream_predictions(spool, input_format, entry),
+        media_type="application/x-ndjson",
+        headers={"X-Model-Version": f"{entry.name}@{entry.version}"}
+    )
+
+# Background scoring jobs
+def score_job_chunk(chunk: dict) -> Tuple[str, int]:
+    """Score one stored job chunk with the active model; runs on a job runner thread.
+
+    Returns the chunk's NDJSON results and how many rows got an inline error.
+    """
+    entry = model_registry.active()
+    if entry is None:
+        raise RuntimeError("Model not loaded")
+    options = chunk['options']
+    output = score_stream_records(
+        chunk['lines'], chunk['input_format'], chunk['csv_header'], chunk['start_index'], entry, "/jobs",
+        options.get('incremental', False), options.get('explain_top_k', 0)
+    )
+    return "".join(json_line(result) for result in output), sum(1 for result in output if 'error' in result)
+
+
+# Interactive requests all go through the inference pool, so pending work there means jobs should wait
+job_runner = JobRunner(job_store, score_job_chunk, JOB_WORKERS, lambda: inference_pending > 0,
+                       JOB_MAX_DEFER_SECONDS, JOB_RETENTION_HOURS * 3600)
+
+
+def job_chunks(lines: Iterator[str]) -> Iterator[List[str]]:
+    """Split job input lines into JOB_CHUNK_SIZE chunks, stopping with ValueError past JOB_MAX_ROWS."""
+    total_rows = 0
+    while True:
+        chunk = list(itertools.islice(lines, JOB_CHUNK_SIZE))
+        if not chunk:
+            return
+        total_rows += len(chunk)
+        if total_rows > JOB_MAX_ROWS:
+            raise ValueError(f"Maximum {JOB_MAX_ROWS} rows per job")
+        yield chunk
+
+
+async def get_job_or_404(job_id: str) -> dict:
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: Request, incremental: bool = False, explain: bool = False,
+                     top_k: int = Query(EXPLANATION_TOP_K, ge=1)):
+    """Queue a cohort for background scoring and return the job, including its job_id.
+
+    The body is {"predictions": [row, ...]} JSON, or an NDJSON or CSV file as for
+    /batch-predict/stream. Rows are validated when their chunk is scored; invalid
+    rows get an inline error in the results, like in the streaming endpoint.
+    """
+    if explain:
+        require_explanations(model_registry.active())
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    input_format = stream_input_format(content_type)
+    spool = None
+    csv_header = None
+    if input_format is not None:
+        spool = await spool_request_body(request)
+        csv_header, lines = spooled_lines(spool, input_format)
+    elif content_type == "application/json":
+        try:
+            payload = json.loads(await request.body())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {str(e)}")
+        if not (isinstance(payload, dict) and isinstance(payload.get('predictions'), list)):
+            raise HTTPException(status_code=400, detail='JSON job bodies must look like {"predictions": [...]}')
+        input_format = "ndjson"
+        lines = iter([json.dumps(row) for row in payload['predictions']])
+    else:
+        raise HTTPException(status_code=415, detail="Content-Type must be application/json, application/x-ndjson or text/csv")
+
+    options = {'incremental': incremental, 'explain_top_k': top_k if explain else 0}
+    try:
+        job = await asyncio.to_thread(job_store.create, input_format, csv_header, options, job_chunks(lines))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if spool is not None:
+            spool.close()
+
+    job_runner.wake()
+    logger.info("Job %s queued: %d rows in %d chunks", job['job_id'], job['total_rows'], job['total_chunks'])
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return await get_job_or_404(job_id)
+
+
+@app.get("/jobs/{job_id}/results")
+async def job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=JOB_RESULTS_MAX_PAGE)):
+    """A page of results in row order. Results stop at the first chunk not scored yet,
+    so next_offset is where to continue; it is null once no more results will come:
+    every row has been returned, or the job failed and its scored rows have been.
+    """
+    job = await get_job_or_404(job_id)
+    results = await asyncio.to_thread(job_store.results, job_id, offset, limit)
+    next_offset = offset + len(results)
+    # A failed job never scores its remaining chunks, so a short page is its last one
+    finished = next_offset >= job['total_rows'] or (job['status'] == 'failed' and len(results) < limit)
+    return FastJSONResponse({
+        'job_id': job_id,
+        'status': job['status'],
+        'offset': offset,
+        'count': len(results),
+        'results': results,
+        'next_offset': None if finished else next_offset
+    })
+
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancel a job and drop its stored input and results."""
+    if not await asyncio.to_thread(job_store.delete, job_id):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {'deleted': job_id}
+
+# Model registry admin endpoints
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled until ADMIN_TOKEN is set")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+class RoutingRequest(BaseModel):
+    candidate: Optional[str] = None
+    candidate_percent: float = Field(0, ge=0, le=100)
+    shadow: Optional[str] = None
+
+
+async def run_registry_call(func, *args):
+    """Run a (possibly slow) registry call in a thread so loading never blocks requests."""
+    try:
+        return await asyncio.to_thread(func, *args)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e).strip("'"))
+    except Exception as e:
+        logger.error(f"❌ Model registry error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model registry error: {str(e)}")
+
+
+@app.get("/admin/models", dependencies=[Depends(require_admin)])
+async def list_models():
+    return {**model_registry.status(), 'shadow_stats': shadow_scorer.report()}
+
+
+@app.post("/admin/models/{name}/load", dependencies=[Depends(require_admin)])
+async def load_model_version(name: str):
+    entry = await run_registry_call(model_registry.load, name)
+    return {'loaded': name, 'version': entry.version}
+
+
+@app.post("/admin/models/{name}/activate", dependencies=[Depends(require_admin)])
+async def activate_model_version(name: str):
+    entry = await run_registry_call(model_registry.activate, name)
+    return {'active': name, 'version': entry.version}
+
+
+@app.post("/admin/routing", dependencies=[Depends(require_admin)])
+async def configure_model_routing(routing: RoutingRequest):
+    await run_registry_call(model_registry.configure_routing, routing.candidate, routing.candidate_percent, routing.shadow)
+    return model_registry.status()
+
+# Model warmup
+def synthetic_request(i: int) -> PredictionRequest:
+    """Deterministic, varied request used to warm up the model."""
+    return PredictionRequest(
+        age=18 + i % 10,
+        gender=("M", "F", "O")[i % 3],
+        nationality=1 + i % 4,
+        highschool_score=40 + (i * 7) % 60,
+        entrance_exam_score_normalized=30 + (i * 11) % 70,
+        department=i % 8 if i % 5 else None,
+        admission_type=i % 3 if i % 4 else None,
+        family_income_bracket=i % 5 if i % 2 else None,
+        parent_education=i % 5,
+        scholarship_status=("none", "scholarship", None)[i % 3],
+        residence_type=("day_scholar", "hostel", None)[i % 3],
+        commute_distance_km=float(i % 30) if i % 2 else None,
+        attendance_pct=40 + (i * 13) % 61 if i % 6 else None,
+        current_sem_cgpa=(i * 17) % 101 / 10 if i % 7 else None,
+        aggregate_cgpa=(i * 19) % 101 / 10 if i % 7 else None,
+        backlogs_count=i % 6 if i % 3 else None,
+        fee_payment_status=("on_time", "delayed", None)[(i // 2) % 3],
+        department_missing=0 if i % 5 else 1,
+        admission_type_missing=0 if i % 4 else 1,
+        backlogs_count_missing=0 if i % 3 else 1,
+        scholarship_status_missing=1 if i % 3 == 2 else 0,
+        fee_payment_status_missing=1 if (i // 2) % 3 == 2 else 0,
+        residence_type_missing=1 if i % 3 == 2 else 0,
+        family_income_bracket_missing=0 if i % 2 else 1,
+        commute_distance_km_missing=0 if i % 2 else 1
+    )
+
+
+def warmup_model(entry: ModelEntry):
+    """Score a synthetic batch and a few single rows so the first real request runs at steady-state latency."""
+    if WARMUP_ROWS <= 0:
+        return
+
+    started = time.perf_counter()
+    sample = [synthetic_request(i) for i in range(WARMUP_ROWS)]
+    predict_frame_proba(prepare_feature_frame(sample, entry), entry)
+    for data in sample[:WARMUP_SINGLE_CALLS]:
+        predict_row_proba(prepare_model_row(data, entry), entry)
+
+    entry.metadata["warmup_seconds"] = round(time.perf_counter() - started, 4)
+    logger.info(f"🔥 Model warmed up with {WARMUP_ROWS} rows in {entry.metadata['warmup_seconds']}s")
+
+
+def initialize_model():
+    """Load the model if it is not loaded yet (a pre-forking parent may have done it), apply routing and mark ready."""
+    global service_ready
+    if model_registry.active() is None:
+        load_model()
+    if model_registry.active() is None:
+        return
+
+    try:
+        model_registry.configure_routing(MODEL_CANDIDATE, MODEL_CANDIDATE_PERCENT, MODEL_SHADOW)
     except Exception as e:
-        logger.error(f"❌ Batch prediction error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+        logger.error(f"❌ Could not apply model routing: {str(e)}")
+    model_registry.start_watcher(MODEL_WATCH_INTERVAL_SECONDS)
+
+    service_ready = True
+    logger.info("✅ Service ready")
+    job_runner.start()
+
+
+def export_native_model(output_path: str):
+    """Save the active model in CatBoost's native .cbm format."""
+    model_registry.active().model.save_model(output_path, format="cbm")
+    logger.info(f"Model exported to: {output_path}")
+
+
+def export_evaluator_arrays(output_path: str):
+    """Save the active model as NumPy arrays that MODEL_BACKEND=numpy serves without catboost."""
+    model = model_registry.active().model
+    arrays = model.arrays if isinstance(model, TreeEvaluator) else export_model_arrays(model)
+    save_model_arrays(arrays, output_path)
+    logger.info(f"Model arrays exported to: {output_path}")
+
+
+def evaluator_check_frame(model, model_path: str, n_rows: int) -> pd.DataFrame:
+    """Feature frame of synthetic requests for a CatBoost model, with unseen categories in every fifth row."""
+    metadata = {'feature_names': model.feature_names_, 'categorical_features': model.get_cat_feature_indices()}
+    entry = ModelEntry("check", model_path, model, metadata, build_feature_plan(metadata))
+    frame = prepare_feature_frame([synthetic_request(i) for i in range(n_rows)], entry)
+    unseen = np.flatnonzero(np.arange(n_rows) % 5 == 4)
+    for j in entry.cat_indices:
+        frame.iloc[unseen, j] = [f"unseen_{i % 7}" for i in unseen]
+    return frame
+
+
+def check_evaluator(n_rows: int = 10000, tolerance: float = 1e-9) -> bool:
+    """Compare the NumPy evaluator with CatBoost's predict_proba for every CatBoost model in MODEL_DIR.
+
+    The arrays go through an .npz round trip, so the check covers the saved format too.
+    """
+    passed = True
+    for name, path in sorted(model_registry.available().items()):
+        if path.endswith(".npz"):
+            continue
+        model = read_catboost_model(path)
+        with tempfile.TemporaryDirectory() as tmp:
+            arrays_path = os.path.join(tmp, "model.npz")
+            save_model_arrays(export_model_arrays(model), arrays_path)
+            evaluator = TreeEvaluator(load_model_arrays(arrays_path))
+
+        frame = evaluator_check_frame(model, path, n_rows)
+        difference = float(np.abs(model.predict_proba(frame) - evaluator.predict_proba(frame)).max())
+        passed &= difference <= tolerance
+        print(f"{name}: max |catboost - numpy| = {difference:.3g} over {n_rows} rows"
+              f"{'' if difference <= tolerance else ' (MISMATCH)'}")
+    return passed
 
 # Startup event
 @app.on_event("startup")
@@ -487,13 +2034,61 @@ async def startup_event():
     logger.info("🚀 Starting Student Dropout Prediction Service...")
     logger.info(f"Python version: {sys.version}")
     logger.info(f"Working directory: {os.getcwd()}")
-    logger.info(f"Model status: {'Loaded' if model is not None else 'Not loaded'}")
+    logger.info(f"Model status: {'Loaded' if model_registry.active() is not None else 'Not loaded'}")
+
+    # Load and warm up in the background so /livez answers while /readyz is still 503
+    threading.Thread(target=initialize_model, name="model-init", daemon=True).start()
+
+# Shutdown event
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("Stopping inference workers...")
+    model_registry.stop_watcher()
+    job_runner.stop()
+    shadow_scorer.shutdown()
+    shutdown_inference_executor()
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Student Dropout Prediction Service")
+    parser.add_argument("--export-cbm", metavar="PATH", help="save the model in native .cbm format and exit")
+    parser.add_argument("--export-arrays", metavar="PATH",
+                        help="save the model as .npz arrays for MODEL_BACKEND=numpy and exit")
+    parser.add_argument("--check-evaluator", action="store_true",
+                        help="compare the NumPy evaluator with CatBoost on every model in MODEL_DIR and exit")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVICE_WORKERS", "1")),
+                        help="number of pre-forked worker processes sharing the loaded model")
+    args = parser.parse_args()
+
+    if args.export_cbm:
+        if load_model() is None:
+            sys.exit(1)
+        export_native_model(args.export_cbm)
+        sys.exit(0)
+
+    if args.export_arrays:
+        if load_model() is None:
+            sys.exit(1)
+        export_evaluator_arrays(args.export_arrays)
+        sys.exit(0)
+
+    if args.check_evaluator:
+        sys.exit(0 if check_evaluator() else 1)
+
+    if args.workers > 1:
+        from prefork import PreforkServer
+
+        # Load once in the parent; workers inherit the model copy-on-write and skip loading
+        if load_model() is None:
+            sys.exit(1)
+        PreforkServer(app, "0.0.0.0", 5001, args.workers).run()
+        sys.exit(0)
+
     import uvicorn
     uvicorn.run(
         app, 
         host="0.0.0.0", 
         port=5001,
-        log_level="info"
+        log_level=None,  # keep the LOG_LEVEL set by configure_logging
+        log_config=None  # uvicorn's loggers go through the same queue
     )
\ No newline at end of file
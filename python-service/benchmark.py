@@ -0,0 +1,337 @@
+"""Benchmark and load test for the prediction service.
+
+Examples:
+    python benchmark.py --output results.json
+    python benchmark.py --http --concurrency 32 --duration 20 --output results.json
+    python benchmark.py --output new.json --compare results.json --threshold 0.1
+
+In-process benchmarks score the models in models/ directly, without the HTTP
+layer. --http also starts a local uvicorn instance and load-tests /predict and
+/batch-predict. Results are written as JSON; --compare flags every metric that
+got worse than the baseline file by more than --threshold and exits with 1.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SERVICE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Metrics where a higher value is better; everything else is a latency
+HIGHER_IS_BETTER = ("rows_per_second", "requests_per_second")
+
+
+# Synthetic payloads
+def synthetic_payload(rng: random.Random, with_user_data: bool) -> dict:
+    """One realistic PredictionRequest body with random optional-field gaps.
+
+    Each optional field is dropped independently and its *_missing flag set to
+    match, so all missing-flag combinations show up in a large enough sample.
+    """
+    payload = {
+        'age': round(rng.uniform(17, 30), 1),
+        'gender': rng.choice(["M", "F", "O"]),
+        'nationality': rng.randint(0, 3),
+        'highschool_score': round(rng.uniform(35, 100), 2),
+        'entrance_exam_score_normalized': round(rng.uniform(0, 100), 2),
+        'parent_education': rng.randint(0, 4),
+        'attendance_pct': round(rng.uniform(40, 100), 1),
+        'current_sem_cgpa': round(rng.uniform(4, 10), 2),
+        'aggregate_cgpa': round(rng.uniform(4, 10), 2),
+    }
+
+    optional_fields = {
+        'department': lambda: rng.randint(0, 7),
+        'admission_type': lambda: rng.randint(0, 2),
+        'family_income_bracket': lambda: rng.randint(0, 4),
+        'scholarship_status': lambda: rng.choice(["none", "scholarship"]),
+        'residence_type': lambda: rng.choice(["day_scholar", "hostel"]),
+        'commute_distance_km': lambda: round(rng.uniform(0, 40), 1),
+        'backlogs_count': lambda: rng.randint(0, 6),
+        'fee_payment_status': lambda: rng.choice(["on_time", "delayed"]),
+    }
+    for field, make_value in optional_fields.items():
+        present = rng.random() > 0.2
+        if present:
+            payload[field] = make_value()
+        payload[f"{field}_missing"] = 0 if present else 1
+
+    if with_user_data:
+        student_id = rng.randint(100000, 999999)
+        payload['userData'] = {
+            'name': f"Student {student_id}",
+            'email': f"student{student_id}@example.edu",
+            'studentId': f"S{student_id}"
+        }
+    return payload
+
+
+def generate_payloads(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [synthetic_payload(rng, with_user_data=i % 2 == 0) for i in range(count)]
+
+
+# Timing helpers
+def summarize(samples: list) -> dict:
+    """Latency percentiles in milliseconds."""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 4),
+        'p50_ms': round(percentile(50), 4),
+        'p95_ms': round(percentile(95), 4),
+        'p99_ms': round(percentile(99), 4),
+    }
+
+
+def time_calls(func, items: list) -> list:
+    samples = []
+    for item in items:
+        started = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# In-process benchmarks
+def run_in_process(payloads: list, model_names: list, batch_sizes: list, iterations: int) -> dict:
+    import app as service
+
+    requests = [service.PredictionRequest.model_validate(payload) for payload in payloads]
+    results = {}
+
+    samples = time_calls(service.PredictionRequest.model_validate, payloads)
+    results['validate_single'] = summarize(samples)
+    results['validate_single']['rows_per_second'] = round(len(samples) / sum(samples), 1)
+
+    available = service.model_registry.available()
+    for name in model_names:
+        if name not in available:
+            print(f"Skipping unknown model '{name}'", file=sys.stderr)
+            continue
+        entry = service.load_model_entry(name, available[name])
+        singles = [requests[i % len(requests)] for i in range(iterations)]
+
+        results[f"{name}/prepare_model_row"] = summarize(
+            time_calls(lambda data: service.prepare_model_row(data, entry), singles)
+        )
+        results[f"{name}/predict_one"] = summarize(
+            time_calls(lambda data: service.predict_one(data, entry), singles)
+        )
+
+        for batch_size in batch_sizes:
+            batch = [requests[i % len(requests)] for i in range(batch_size)]
+            repeats = max(3, min(50, 20000 // batch_size))
+
+            frame_samples = time_calls(lambda rows: service.prepare_feature_frame(rows, entry), [batch] * repeats)
+            results[f"{name}/prepare_feature_frame/{batch_size}"] = summarize(frame_samples)
+
+            batch_samples = time_calls(lambda rows: service.predict_batch(rows, entry), [batch] * repeats)
+            stats = summarize(batch_samples)
+            stats['rows_per_second'] = round(batch_size * len(batch_samples) / sum(batch_samples), 1)
+            results[f"{name}/predict_batch/{batch_size}"] = stats
+
+        print(f"Finished in-process benchmarks for '{name}'", file=sys.stderr)
+
+    return results
+
+
+# HTTP load test
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=env
+    )
+
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/readyz")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.25)
+
+    server.terminate()
+    raise RuntimeError("Server did not become ready in time")
+
+
+def load_test(port: int, path: str, bodies: list, concurrency: int, duration: float) -> dict:
+    """Closed-loop load test: each worker sends its next request as soon as the previous one returns."""
+    stop_at = time.monotonic() + duration
+    lock = threading.Lock()
+    latencies = []
+    statuses = {}
+
+    def worker(worker_index: int):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        local_latencies = []
+        local_statuses = {}
+        i = worker_index
+        while time.monotonic() < stop_at:
+            body = bodies[i % len(bodies)]
+            i += concurrency
+            started = time.perf_counter()
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies) if latencies else {'count': 0}
+    stats['requests_per_second'] = round(len(latencies) / elapsed, 1)
+    stats['status_codes'] = statuses
+    return stats
+
+
+def run_http(payloads: list, port: int, concurrency: int, duration: float, http_batch_size: int) -> dict:
+    env = dict(os.environ)
+    server = start_server(port, env)
+    try:
+        single_bodies = [json.dumps(payload).encode() for payload in payloads]
+        batch_bodies = [
+            json.dumps({'predictions': payloads[start:start + http_batch_size]}).encode()
+            for start in range(0, max(1, len(payloads) - http_batch_size + 1), http_batch_size)
+        ]
+
+        results = {'http/predict': load_test(port, "/predict", single_bodies, concurrency, duration)}
+        batch_stats = load_test(port, "/batch-predict", batch_bodies, max(1, concurrency // 4), duration)
+        batch_stats['rows_per_second'] = round(batch_stats['requests_per_second'] * http_batch_size, 1)
+        results[f"http/batch-predict/{http_batch_size}"] = batch_stats
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# Regression comparison
+def compare_results(baseline: dict, current: dict, threshold: float) -> list:
+    """List metrics that are worse than the baseline by more than threshold (a fraction)."""
+    regressions = []
+    for name, stats in current.items():
+        base_stats = baseline.get(name)
+        if not base_stats:
+            continue
+        for metric, value in stats.items():
+            base_value = base_stats.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)) or metric == 'count':
+                continue
+            if base_value <= 0:
+                continue
+
+            if metric in HIGHER_IS_BETTER:
+                change = (base_value - value) / base_value
+            else:
+                change = (value - base_value) / base_value
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {base_value} -> {value} ({change:+.1%} worse)")
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the student dropout prediction service")
+    parser.add_argument("--rows", type=int, default=2000, help="synthetic payloads to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--models", default="catboost-model,catboost-model1", help="comma-separated model names")
+    parser.add_argument("--batch-sizes", default="1,100,1000,10000")
+    parser.add_argument("--iterations", type=int, default=500, help="single-row calls per model")
+    parser.add_argument("--cache", action="store_true", help="keep the prediction cache enabled")
+    parser.add_argument("--http", action="store_true", help="also load-test a local uvicorn instance")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per HTTP endpoint")
+    parser.add_argument("--http-batch-size", type=int, default=500)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag regressions against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown as a fraction")
+    args = parser.parse_args()
+
+    # Measure the model, not cache hits, and keep logging out of the timings
+    if not args.cache:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("MODEL_WATCH_INTERVAL_SECONDS", "0")
+    sys.path.insert(0, SERVICE_DIR)
+
+    payloads = generate_payloads(args.rows, args.seed)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",") if size]
+    model_names = [name for name in args.models.split(",") if name]
+
+    results = run_in_process(payloads, model_names, batch_sizes, args.iterations)
+    if args.http:
+        results.update(run_http(payloads, args.port, args.concurrency, args.duration, args.http_batch_size))
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args)
+        },
+        'results': results
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare_results(baseline, results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
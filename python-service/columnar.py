@@ -0,0 +1,265 @@
+import json
+import typing
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Content types for columnar batches; msgpack and Arrow need their optional packages
+MSGPACK_CONTENT_TYPES = ("application/msgpack", "application/x-msgpack")
+ARROW_CONTENT_TYPES = ("application/vnd.apache.arrow.stream",)
+
+# Validation stops reporting after this many errors, like a truncated 422
+MAX_REPORTED_ERRORS = 100
+
+# Integers from this magnitude on are not exact in float64 and are re-read from the input
+FLOAT_EXACT_LIMIT = 2 ** 53
+INT64_LIMIT = 2 ** 63
+
+
+class ColumnarBatch:
+    """Validated request columns: field name -> array with one value per row.
+
+    Float fields are float64 arrays with NaN for missing values. Integer fields
+    are object arrays of numpy ints, so categorical string conversion gives "3"
+    rather than "3.0". Integer and string fields use None for missing values.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], n_rows: int, user_columns: Dict[str, list]):
+        self.columns = columns
+        self.n_rows = n_rows
+        self.user_columns = user_columns
+
+    def __len__(self):
+        return self.n_rows
+
+
+class ColumnSpec:
+    """Validation rules for one request field, read from the Pydantic model."""
+
+    def __init__(self, name: str, kind: str, required: bool, nullable: bool, default,
+                 ge: Optional[float] = None, le: Optional[float] = None, choices: Optional[list] = None,
+                 choice_error: Optional[str] = None):
+        self.name = name
+        self.kind = kind
+        self.required = required
+        self.nullable = nullable
+        self.default = default
+        self.ge = ge
+        self.le = le
+        self.choices = choices
+        self.choice_error = choice_error
+
+
+def column_specs(model, choices: Dict[str, list], choice_error) -> List[ColumnSpec]:
+    """Build column rules from a Pydantic model's fields and Field(ge=..., le=...) constraints.
+
+    choices holds the allowed values of enum-like string fields and
+    choice_error(field) the message their validators raise.
+    """
+    specs = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        nullable = type(None) in typing.get_args(annotation)
+        if nullable:
+            annotation = next(arg for arg in typing.get_args(annotation) if arg is not type(None))
+        if annotation not in (float, int, str):
+            continue
+
+        ge = next((meta.ge for meta in field.metadata if hasattr(meta, "ge")), None)
+        le = next((meta.le for meta in field.metadata if hasattr(meta, "le")), None)
+        specs.append(ColumnSpec(
+            name, annotation.__name__, field.is_required(), nullable, field.default, ge, le,
+            choices.get(name), choice_error(name) if name in choices else None
+        ))
+    return specs
+
+
+def _format_bound(value) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _as_sequence(values):
+    # Object arrays (e.g. strings with nulls from Arrow) are easier to handle as lists
+    if isinstance(values, np.ndarray) and values.dtype == object:
+        return values.tolist()
+    return values
+
+
+def _exact_integer(value) -> Optional[int]:
+    """The integer a large value stands for, or None where Pydantic rejects its size."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    # Like Pydantic, floats must fit in int64
+    value = float(value)
+    return int(value) if abs(value) < INT64_LIMIT else None
+
+
+def _validate_numeric(spec: ColumnSpec, values, errors: list):
+    type_name = "integer" if spec.kind == "int" else "number"
+    type_error = f"Input should be a valid {type_name}"
+    unparseable = np.zeros(len(values), dtype=bool)
+    try:
+        numbers = np.asarray(_as_sequence(values), dtype=np.float64)
+    except (TypeError, ValueError):
+        # Slow path, only to find the offending values
+        numbers = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                numbers[i] = np.nan if value is None else float(value)
+            except (TypeError, ValueError):
+                unparseable[i] = True
+                message = f"{type_error}, unable to parse string as {'an integer' if spec.kind == 'int' else 'a number'}" \
+                    if isinstance(value, str) else type_error
+                errors.append(([spec.name, i], message))
+
+    missing = np.isnan(numbers) & ~unparseable
+    if not spec.nullable and missing.any():
+        errors.extend(([spec.name, int(i)], type_error) for i in np.flatnonzero(missing))
+    # Like Pydantic, report only the first failed rule per value
+    reported = missing | unparseable
+
+    large_integers = {}
+    if spec.kind == "int":
+        for i in np.flatnonzero(~reported & ~(np.abs(numbers) < FLOAT_EXACT_LIMIT)):
+            value = _exact_integer(values[i]) if np.isfinite(numbers[i]) else None
+            if value is None:
+                errors.append(([spec.name, int(i)], "Unable to parse input string as an integer, exceeded maximum size"))
+                reported[i] = True
+            else:
+                large_integers[int(i)] = value
+
+    checks = []
+    if spec.kind == "int":
+        checks.append((numbers != np.floor(numbers), "Input should be a valid integer, got a number with a fractional part"))
+    if spec.ge is not None:
+        checks.append((numbers < spec.ge, f"Input should be greater than or equal to {_format_bound(spec.ge)}"))
+    if spec.le is not None:
+        checks.append((numbers > spec.le, f"Input should be less than or equal to {_format_bound(spec.le)}"))
+    for failed, message in checks:
+        failed &= ~reported
+        if failed.any():
+            errors.extend(([spec.name, int(i)], message) for i in np.flatnonzero(failed))
+            reported |= failed
+
+    missing |= unparseable
+
+    if spec.kind == "float":
+        return numbers
+    # Only values that passed are converted, so out-of-range ones cannot overflow
+    exact = ~missing & (np.abs(numbers) < FLOAT_EXACT_LIMIT)
+    integers = np.empty(len(numbers), dtype=object)
+    integers[exact] = numbers[exact].astype(np.int64)
+    integers[~exact] = None
+    for i, value in large_integers.items():
+        integers[i] = value
+    return integers
+
+
+def _validate_string(spec: ColumnSpec, values, errors: list):
+    strings = np.empty(len(values), dtype=object)
+    strings[:] = _as_sequence(values)
+
+    missing = np.equal(strings, None)
+    if not spec.nullable and missing.any():
+        errors.extend(([spec.name, int(i)], "Input should be a valid string") for i in np.flatnonzero(missing))
+
+    if spec.choices is not None:
+        # Any allowed choice is a string, so type errors are only looked for among invalid values
+        invalid = ~np.isin(strings, spec.choices) & ~missing
+        for i in np.flatnonzero(invalid):
+            message = f"Value error, {spec.choice_error}" if isinstance(strings[i], str) else "Input should be a valid string"
+            errors.append(([spec.name, int(i)], message))
+    else:
+        not_string = np.array([not isinstance(value, str) for value in strings], dtype=bool) & ~missing
+        if not_string.any():
+            errors.extend(([spec.name, int(i)], "Input should be a valid string") for i in np.flatnonzero(not_string))
+    return strings
+
+
+def validate_columns(columns: dict, specs: List[ColumnSpec], user_fields: dict):
+    """Validate and coerce raw request columns with whole-array checks.
+
+    user_fields maps the echoed userData columns to an optional per-value check
+    returning an error message. Returns (ColumnarBatch or None, errors), where
+    each error is (loc, message).
+    """
+    errors = []
+    if not isinstance(columns, dict) or not columns:
+        return None, [([], "Input should be a non-empty object of columns")]
+
+    if not all(isinstance(values, (list, np.ndarray)) for values in columns.values()):
+        return None, [([], "Every column must be an array")]
+    lengths = {len(values) for values in columns.values()}
+    if len(lengths) != 1:
+        return None, [([], "All columns must have the same length")]
+    n_rows = lengths.pop()
+
+    validated = {}
+    for spec in specs:
+        values = columns.get(spec.name)
+        if values is None:
+            if spec.required:
+                errors.append(([spec.name], "Field required"))
+                continue
+            values = [spec.default] * n_rows
+
+        if spec.kind == "str":
+            validated[spec.name] = _validate_string(spec, values, errors)
+        else:
+            validated[spec.name] = _validate_numeric(spec, values, errors)
+
+    user_columns = {}
+    for name, check in user_fields.items():
+        values = columns.get(name)
+        if values is None:
+            continue
+        values = list(_as_sequence(values))
+        if check is not None:
+            for i, value in enumerate(values):
+                message = check(value) if value is not None else None
+                if message:
+                    errors.append(([name, i], message))
+        user_columns[name] = values
+
+    if errors:
+        return None, errors[:MAX_REPORTED_ERRORS]
+    return ColumnarBatch(validated, n_rows, user_columns), []
+
+
+# Wire formats
+def decode_columns(body: bytes, content_type: str) -> dict:
+    """Read the raw columns of a columnar request body (JSON, msgpack or Arrow IPC stream)."""
+    if content_type in ARROW_CONTENT_TYPES:
+        import pyarrow as pa
+
+        table = pa.ipc.open_stream(body).read_all()
+        return {name: table.column(name).to_numpy(zero_copy_only=False) for name in table.column_names}
+
+    if content_type in MSGPACK_CONTENT_TYPES:
+        import msgpack
+
+        payload = msgpack.unpackb(body)
+    else:
+        payload = json.loads(body)
+    return payload.get("columns") if isinstance(payload, dict) else None
+
+
+def encode_columns(columns: Dict[str, list], media_type: str) -> bytes:
+    """Serialize result columns in the requested columnar format."""
+    if media_type in ARROW_CONTENT_TYPES:
+        import pyarrow as pa
+
+        sink = pa.BufferOutputStream()
+        table = pa.table(columns)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    import msgpack
+
+    return msgpack.packb({'columns': columns, 'count': len(next(iter(columns.values()), []))})
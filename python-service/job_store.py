@@ -0,0 +1,343 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlite_connections import SQLiteConnections
+
+logger = logging.getLogger(__name__)
+
+# A claimed chunk that is not finished within this time is handed to another worker
+CHUNK_LEASE_SECONDS = 300.0
+# Seconds between checks for new chunks when the queue is empty
+POLL_INTERVAL_SECONDS = 1.0
+# Seconds between purges of old finished jobs
+PURGE_INTERVAL_SECONDS = 600.0
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Background scoring jobs and their chunks, persisted in SQLite.
+
+    A job's input is stored as raw NDJSON lines or CSV rows split into chunks,
+    and each chunk's NDJSON output is written when it has been scored. Progress
+    therefore survives a restart: unfinished chunks are simply claimed again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connections = SQLiteConnections(
+            path,
+            "CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "input_format TEXT NOT NULL, csv_header TEXT, options TEXT NOT NULL, "
+            "total_rows INTEGER NOT NULL, total_chunks INTEGER NOT NULL, "
+            "completed_rows INTEGER NOT NULL DEFAULT 0, completed_chunks INTEGER NOT NULL DEFAULT 0, "
+            "error_rows INTEGER NOT NULL DEFAULT 0, error TEXT, created_at REAL NOT NULL, "
+            "started_at REAL, finished_at REAL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS job_chunks (job_id TEXT NOT NULL, chunk_index INTEGER NOT NULL, "
+            "start_index INTEGER NOT NULL, row_count INTEGER NOT NULL, input TEXT, output TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, leased_by INTEGER, leased_until REAL, "
+            "PRIMARY KEY (job_id, chunk_index));"
+            "CREATE INDEX IF NOT EXISTS job_chunks_pending ON job_chunks (job_id, chunk_index) "
+            "WHERE output IS NULL;"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        return self.connections.get()
+
+    def create(self, input_format: str, csv_header: Optional[List[str]], options: dict,
+               chunks: Iterable[List[str]]) -> dict:
+        """Store a new queued job; chunks is consumed inside one transaction.
+
+        Raises ValueError when there are no rows, and lets any error raised while
+        reading chunks propagate, in both cases without storing anything.
+        """
+        job_id = uuid.uuid4().hex
+        total_rows = 0
+        total_chunks = 0
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            for chunk in chunks:
+                conn.execute(
+                    "INSERT INTO job_chunks (job_id, chunk_index, start_index, row_count, input) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, total_chunks, total_rows, len(chunk), json.dumps(chunk))
+                )
+                total_rows += len(chunk)
+                total_chunks += 1
+            if not total_rows:
+                raise ValueError("The job has no rows to score")
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, input_format, csv_header, options, total_rows, total_chunks, "
+                "created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, input_format, json.dumps(csv_header) if csv_header else None, json.dumps(options),
+                 total_rows, total_chunks, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            "SELECT job_id, status, options, total_rows, completed_rows, error_rows, total_chunks, "
+            "completed_chunks, error, created_at, started_at, finished_at FROM jobs WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        (job_id, status, options, total_rows, completed_rows, error_rows, total_chunks,
+         completed_chunks, error, created_at, started_at, finished_at) = row
+        return {
+            'job_id': job_id,
+            'status': status,
+            'options': json.loads(options),
+            'total_rows': total_rows,
+            'completed_rows': completed_rows,
+            'error_rows': error_rows,
+            'progress': round(completed_rows / total_rows, 4) if total_rows else 1.0,
+            'total_chunks': total_chunks,
+            'completed_chunks': completed_chunks,
+            'error': error,
+            'created_at': created_at,
+            'started_at': started_at,
+            'finished_at': finished_at
+        }
+
+    def results(self, job_id: str, offset: int, limit: int) -> List[dict]:
+        """Results for rows offset .. offset + limit - 1, stopping at the first chunk not scored yet."""
+        rows = self._connection().execute(
+            "SELECT start_index, output FROM job_chunks WHERE job_id = ? AND start_index + row_count > ? "
+            "AND start_index < ? ORDER BY chunk_index",
+            (job_id, offset, offset + limit)
+        )
+        results = []
+        for start_index, output in rows:
+            if output is None:
+                break
+            lines = output.splitlines()[max(0, offset - start_index):offset + limit - start_index]
+            results.extend(json.loads(line) for line in lines)
+        return results
+
+    def delete(self, job_id: str) -> bool:
+        conn = self._connection()
+        with conn:
+            deleted = conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,)).rowcount
+            conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job_id,))
+        return bool(deleted)
+
+    def claim_chunk(self) -> Optional[dict]:
+        """Lease the oldest unscored chunk of a queued or running job to this process."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            # Take the write lock first so two workers never claim the same chunk
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT c.job_id, c.chunk_index, c.start_index, c.input, j.input_format, j.csv_header, j.options "
+                "FROM job_chunks c JOIN jobs j ON j.job_id = c.job_id "
+                "WHERE j.status IN ('queued', 'running') AND c.output IS NULL "
+                "AND (c.leased_until IS NULL OR c.leased_until < ?) "
+                "ORDER BY j.created_at, c.chunk_index LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, chunk_index, start_index, lines, input_format, csv_header, options = row
+            conn.execute(
+                "UPDATE job_chunks SET attempts = attempts + 1, leased_by = ?, leased_until = ? "
+                "WHERE job_id = ? AND chunk_index = ?",
+                (os.getpid(), now + CHUNK_LEASE_SECONDS, job_id, chunk_index)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?), updated_at = ? "
+                "WHERE job_id = ?",
+                (now, now, job_id)
+            )
+        return {
+            'job_id': job_id,
+            'chunk_index': chunk_index,
+            'start_index': start_index,
+            'lines': json.loads(lines),
+            'input_format': input_format,
+            'csv_header': json.loads(csv_header) if csv_header else None,
+            'options': json.loads(options)
+        }
+
+    def complete_chunk(self, job_id: str, chunk_index: int, output: str, row_count: int, error_rows: int):
+        """Store a chunk's NDJSON output and advance its job; the job completes with its last chunk."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            updated = conn.execute(
+                "UPDATE job_chunks SET output = ?, input = NULL, leased_by = NULL, leased_until = NULL "
+                "WHERE job_id = ? AND chunk_index = ? AND output IS NULL",
+                (output, job_id, chunk_index)
+            ).rowcount
+            if not updated:
+                # Deleted meanwhile, or finished by a worker that took over an expired lease
+                return
+            # Right-hand sides see the old column values
+            conn.execute(
+                "UPDATE jobs SET completed_chunks = completed_chunks + 1, completed_rows = completed_rows + ?, "
+                "error_rows = error_rows + ?, updated_at = ?, "
+                "status = CASE WHEN completed_chunks + 1 >= total_chunks THEN 'completed' ELSE status END, "
+                "finished_at = CASE WHEN completed_chunks + 1 >= total_chunks THEN ? ELSE finished_at END "
+                "WHERE job_id = ? AND status = 'running'",
+                (row_count, error_rows, now, now, job_id)
+            )
+
+    def fail_chunk(self, job_id: str, chunk_index: int, error: str, max_attempts: int):
+        """Release a chunk whose scoring raised; the job fails once the chunk has used max_attempts."""
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            row = conn.execute(
+                "SELECT attempts FROM job_chunks WHERE job_id = ? AND chunk_index = ? AND output IS NULL",
+                (job_id, chunk_index)
+            ).fetchone()
+            if row is None:
+                return
+            conn.execute(
+                "UPDATE job_chunks SET leased_by = NULL, leased_until = NULL WHERE job_id = ? AND chunk_index = ?",
+                (job_id, chunk_index)
+            )
+            if row[0] >= max_attempts:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, updated_at = ? WHERE job_id = ?",
+                    (error, now, now, job_id)
+                )
+
+    def release_stale_leases(self):
+        """Hand out again the chunks leased by processes that are gone, e.g. after a crash.
+
+        Leases held under this process's own pid are stale too: a process that is
+        just starting has not claimed anything yet.
+        """
+        conn = self._connection()
+        with conn:
+            pids = [pid for (pid,) in conn.execute(
+                "SELECT DISTINCT leased_by FROM job_chunks WHERE output IS NULL AND leased_by IS NOT NULL"
+            )]
+            stale = [pid for pid in pids if pid == os.getpid() or not _process_alive(pid)]
+            for pid in stale:
+                conn.execute(
+                    "UPDATE job_chunks SET leased_by = NULL, leased_until = NULL WHERE leased_by = ? AND output IS NULL",
+                    (pid,)
+                )
+        if stale:
+            logger.info("Released job chunks leased by stopped processes %s", stale)
+
+    def purge(self, finished_before: float) -> int:
+        """Delete completed and failed jobs that finished before the given time."""
+        conn = self._connection()
+        with conn:
+            job_ids = [job_id for (job_id,) in conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (finished_before,)
+            )]
+            for job_id in job_ids:
+                conn.execute("DELETE FROM job_chunks WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        return len(job_ids)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        return dict(self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobRunner:
+    """Scores job chunks on a few background threads, giving way to interactive traffic.
+
+    score_chunk(chunk) returns (ndjson_output, error_rows). Before taking a chunk a
+    worker waits while is_busy() reports interactive requests in flight, for at most
+    max_defer_seconds so that jobs still progress under constant load. Chunks stay
+    small, so an interactive request arriving mid-chunk waits at most one chunk.
+    """
+
+    def __init__(self, store: JobStore, score_chunk: Callable[[dict], Tuple[str, int]], workers: int,
+                 is_busy: Callable[[], bool], max_defer_seconds: float, retention_seconds: float,
+                 max_attempts: int = 3):
+        self.store = store
+        self.score_chunk = score_chunk
+        self.workers = workers
+        self.is_busy = is_busy
+        self.max_defer_seconds = max_defer_seconds
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.last_purge = 0.0
+
+    def start(self):
+        if self.threads or self.workers <= 0:
+            return
+        self.stop_event.clear()
+        self.store.release_stale_leases()
+        for slot in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-runner-{slot}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info("Job runner started with %d workers", self.workers)
+
+    def wake(self):
+        """Tell idle workers that a job was submitted."""
+        self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+        self.threads = []
+
+    def _run(self):
+        # Lower this thread's CPU priority (Linux applies nice values per thread)
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except (AttributeError, OSError):
+            pass
+
+        while not self.stop_event.is_set():
+            deferred_until = time.monotonic() + self.max_defer_seconds
+            while self.is_busy() and time.monotonic() < deferred_until and not self.stop_event.is_set():
+                self.stop_event.wait(0.05)
+
+            try:
+                chunk = self.store.claim_chunk()
+            except sqlite3.Error as e:
+                logger.error("❌ Could not claim a job chunk: %s", e)
+                chunk = None
+            if chunk is None:
+                self._purge_finished()
+                self.wake_event.wait(POLL_INTERVAL_SECONDS)
+                self.wake_event.clear()
+                continue
+
+            try:
+                output, error_rows = self.score_chunk(chunk)
+                self.store.complete_chunk(chunk['job_id'], chunk['chunk_index'], output, len(chunk['lines']), error_rows)
+            except Exception as e:
+                logger.exception("❌ Job %s chunk %d failed: %s", chunk['job_id'], chunk['chunk_index'], e)
+                self.store.fail_chunk(chunk['job_id'], chunk['chunk_index'], str(e), self.max_attempts)
+
+    def _purge_finished(self):
+        now = time.time()
+        if now - self.last_purge < PURGE_INTERVAL_SECONDS:
+            return
+        self.last_purge = now
+        try:
+            purged = self.store.purge(now - self.retention_seconds)
+        except sqlite3.Error as e:
+            logger.error("❌ Could not purge finished jobs: %s", e)
+            return
+        if purged:
+            logger.info("Purged %d finished jobs", purged)
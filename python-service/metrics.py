@@ -0,0 +1,220 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Latency buckets in seconds, from 100us to 30s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+INF_LABEL = 'le="+Inf"'
+SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.type_name = "counter"
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.type_name = "gauge"
+
+    def set(self, labels: Tuple = (), value: float = 0):
+        with self.lock:
+            self.values[labels] = value
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.type_name = "histogram"
+        self.buckets = buckets
+        # labels -> [bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels: Tuple, value: float):
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 2)
+            state[position] += 1
+            state[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self.lock:
+            items = [(labels, list(state)) for labels, state in self.values.items()]
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                bucket_labels = _format_labels(labels, 'le="%s"' % _format_value(bound))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            cumulative += state[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(labels, INF_LABEL)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {_format_value(state[-1])}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+
+class MetricsRegistry:
+    """Minimal Prometheus-style metrics, cheap enough to stay on in production.
+
+    Metrics are addressed by name with keyword labels. Inside capture(), the
+    calling thread's observations are also recorded into a list, so work done in
+    a process worker can be replayed into the parent's registry.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, list]]]] = []
+        self.local = threading.local()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self.metrics.setdefault(name, Gauge(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, list]]]):
+        """Register a callback returning (name, type, help, [(labels dict, value)]) at scrape time."""
+        self.collectors.append(collector)
+
+    def _record(self, kind: str, name: str, labels: Tuple, value: float):
+        captured = getattr(self.local, "captured", None)
+        if captured is not None:
+            captured.append((kind, name, labels, value))
+        metric = self.metrics[name]
+        if kind == "observe":
+            metric.observe(labels, value)
+        elif kind == "set":
+            metric.set(labels, value)
+        else:
+            metric.inc(labels, value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        self._record("inc", name, tuple(sorted(labels.items())), amount)
+
+    def set(self, name: str, value: float, **labels):
+        self._record("set", name, tuple(sorted(labels.items())), value)
+
+    def observe(self, name: str, value: float, **labels):
+        self._record("observe", name, tuple(sorted(labels.items())), value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @contextmanager
+    def capture(self):
+        """Collect this thread's observations so they can be replayed elsewhere."""
+        previous = getattr(self.local, "captured", None)
+        self.local.captured = captured = []
+        try:
+            yield captured
+        finally:
+            self.local.captured = previous
+
+    def replay(self, observations: list):
+        for kind, name, labels, value in observations:
+            self._record(kind, name, labels, value)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+
+        for collector in self.collectors:
+            for name, type_name, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {type_name}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency, status and in-flight counts per endpoint.
+
+    Only paths in tracked_paths get their own label; everything else is grouped
+    as "other" to keep label cardinality bounded. The request start time is stored
+    in scope["state"] so endpoints can time the parse/validation stage.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry, tracked_paths: Iterable[str]):
+        self.app = app
+        self.registry = registry
+        self.tracked_paths = set(tracked_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        scope.setdefault("state", {})["received_at"] = started
+        endpoint = scope["path"] if scope["path"] in self.tracked_paths else "other"
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        self.registry.inc("http_requests_in_flight", 1, endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.inc("http_requests_in_flight", -1, endpoint=endpoint)
+            self.registry.observe("http_request_duration_seconds", time.perf_counter() - started, endpoint=endpoint)
+            self.registry.inc("http_requests_total", endpoint=endpoint, status=str(status["code"]))
+            if status["code"] == 422:
+                self.registry.inc("prediction_errors_total", type="validation_error")
@@ -0,0 +1,252 @@
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MODEL_EXTENSIONS = (".cbm", ".pkl")
+
+# Registry of the current process, used to resolve pickled entry references
+_process_registry = None
+
+
+def _restore_entry(name: str, version: str):
+    return _process_registry.resolve(name, version)
+
+
+class ModelEntry:
+    """One loaded model version plus everything needed to score with it.
+
+    Entries are immutable once built. A request keeps the entry it was routed to,
+    so swapping the registry's active model never affects in-flight requests.
+    """
+
+    def __init__(self, name: str, path: str, model, metadata: dict, feature_plan: list):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.metadata = metadata
+        self.version = metadata.get('version', '')
+        self.feature_plan = feature_plan
+        self.cat_indices = [i for i, (_, categorical) in enumerate(feature_plan) if categorical]
+        self.mtime = os.path.getmtime(path)
+
+    def __reduce__(self):
+        # Process workers get a reference, not a copy of the model
+        return (_restore_entry, (self.name, self.version))
+
+
+class ModelRegistry:
+    """Loaded models by name, plus the active/candidate/shadow routing.
+
+    Models are named after their file stem in model_dir. loader(name, path)
+    builds a ModelEntry. Loading happens outside the lock and only the final
+    swap is done under it, so requests are never blocked by a reload.
+    """
+
+    def __init__(self, model_dir: str, loader: Callable[[str, str], ModelEntry],
+                 on_change: Optional[Callable[[ModelEntry], None]] = None,
+                 extensions: Tuple[str, ...] = MODEL_EXTENSIONS):
+        global _process_registry
+        self.model_dir = model_dir
+        self.extensions = extensions
+        self.loader = loader
+        self.on_change = on_change
+        self.models: Dict[str, ModelEntry] = {}
+        self.paths: Dict[str, str] = {}
+        self.active_name = None
+        self.candidate_name = None
+        self.candidate_percent = 0.0
+        self.shadow_name = None
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+        self.watcher = None
+        _process_registry = self
+
+    def available(self) -> Dict[str, str]:
+        """Model files in model_dir by name; the earliest of self.extensions wins for the same name."""
+        found = {}
+        ranks = {}
+        if os.path.isdir(self.model_dir):
+            for filename in sorted(os.listdir(self.model_dir)):
+                stem, extension = os.path.splitext(filename)
+                if extension in self.extensions and (
+                    stem not in found or self.extensions.index(extension) < ranks[stem]
+                ):
+                    found[stem] = os.path.join(self.model_dir, filename)
+                    ranks[stem] = self.extensions.index(extension)
+        found.update(self.paths)
+        return found
+
+    def load(self, name: str, path: Optional[str] = None) -> ModelEntry:
+        """Load (or reload) a model and swap it in under its name."""
+        path = path or self.available().get(name)
+        if path is None:
+            raise KeyError(f"Unknown model: {name}")
+
+        # One load at a time, but requests keep using the current entries meanwhile
+        with self.load_lock:
+            entry = self.loader(name, path)
+            with self.lock:
+                self.models[name] = entry
+                self.paths[name] = path
+                if self.active_name is None:
+                    self.active_name = name
+
+        logger.info(f"Model '{name}' version {entry.version} is available")
+        if self.on_change is not None:
+            self.on_change(entry)
+        return entry
+
+    def get(self, name: Optional[str]) -> Optional[ModelEntry]:
+        return self.models.get(name) if name else None
+
+    def resolve(self, name: str, version: str) -> ModelEntry:
+        """Find the entry a request was routed to.
+
+        A forked worker holds a copy of the registry from fork time; when the
+        parent has hot-swapped the model since, the worker loads it itself.
+        """
+        entry = self.models.get(name)
+        if entry is None or entry.version != version:
+            entry = self.load(name)
+            if entry.version != version:
+                logger.warning(f"Model '{name}' changed on disk: wanted {version}, serving {entry.version}")
+        return entry
+
+    def ensure_loaded(self, name: str) -> ModelEntry:
+        return self.models.get(name) or self.load(name)
+
+    def activate(self, name: str) -> ModelEntry:
+        entry = self.ensure_loaded(name)
+        with self.lock:
+            self.active_name = name
+        logger.info(f"Active model is now '{name}' version {entry.version}")
+        return entry
+
+    def configure_routing(self, candidate: Optional[str], candidate_percent: float, shadow: Optional[str]):
+        if not 0 <= candidate_percent <= 100:
+            raise ValueError("candidate_percent must be between 0 and 100")
+        if candidate:
+            self.ensure_loaded(candidate)
+        if shadow:
+            self.ensure_loaded(shadow)
+        with self.lock:
+            self.candidate_name = candidate or None
+            self.candidate_percent = candidate_percent if candidate else 0.0
+            self.shadow_name = shadow or None
+
+    def active(self) -> Optional[ModelEntry]:
+        return self.models.get(self.active_name) if self.active_name else None
+
+    def route(self) -> Optional[ModelEntry]:
+        """Pick the model for one request: the candidate for candidate_percent of traffic, else the active one."""
+        candidate = self.get(self.candidate_name)
+        if candidate is not None and random.random() * 100 < self.candidate_percent:
+            return candidate
+        return self.active()
+
+    def shadow(self) -> Optional[ModelEntry]:
+        return self.get(self.shadow_name)
+
+    def reload_changed(self):
+        """Reload every loaded model whose file changed on disk."""
+        for name, entry in list(self.models.items()):
+            try:
+                if os.path.getmtime(entry.path) != entry.mtime:
+                    logger.info(f"Model file changed, reloading '{name}'")
+                    self.load(name, entry.path)
+            except Exception as e:
+                logger.error(f"❌ Could not reload model '{name}': {str(e)}")
+
+    def start_watcher(self, interval_seconds: float):
+        """Poll loaded model files and hot-reload them when they change."""
+        if interval_seconds <= 0 or self.watcher is not None:
+            return
+
+        stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval_seconds):
+                self.reload_changed()
+
+        self.watcher = (threading.Thread(target=watch, name="model-watcher", daemon=True), stop)
+        self.watcher[0].start()
+
+    def stop_watcher(self):
+        if self.watcher is not None:
+            self.watcher[1].set()
+            self.watcher = None
+
+    def status(self) -> dict:
+        return {
+            'active': self.active_name,
+            'candidate': self.candidate_name,
+            'candidate_percent': self.candidate_percent,
+            'shadow': self.shadow_name,
+            'loaded': {
+                name: {'version': entry.version, 'path': entry.path}
+                for name, entry in self.models.items()
+            },
+            'available': sorted(self.available())
+        }
+
+
+class ShadowScorer:
+    """Scores requests with the shadow model in the background and tracks disagreement.
+
+    score(entry, rows) must return the predicted class per row. Work beyond
+    max_pending queued batches is dropped rather than slowing down requests.
+    """
+
+    def __init__(self, score: Callable[[ModelEntry, list], List[str]], max_pending: int):
+        self.score = score
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.stats = {}
+
+    def submit(self, entry: ModelEntry, rows: list, primary_classes: List[str]):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                self._stats_for(entry)['dropped'] += len(rows)
+                return
+            self.pending += 1
+        self.executor.submit(self._run, entry, rows, primary_classes)
+
+    def _stats_for(self, entry: ModelEntry) -> dict:
+        key = f"{entry.name}@{entry.version}"
+        if key not in self.stats:
+            self.stats[key] = {'compared': 0, 'disagreements': 0, 'dropped': 0, 'errors': 0}
+        return self.stats[key]
+
+    def _run(self, entry: ModelEntry, rows: list, primary_classes: List[str]):
+        try:
+            shadow_classes = self.score(entry, rows)
+            disagreements = sum(1 for a, b in zip(primary_classes, shadow_classes) if a != b)
+            with self.lock:
+                stats = self._stats_for(entry)
+                stats['compared'] += len(rows)
+                stats['disagreements'] += disagreements
+        except Exception as e:
+            logger.error(f"❌ Shadow scoring failed: {str(e)}")
+            with self.lock:
+                self._stats_for(entry)['errors'] += 1
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                key: dict(stats, disagreement_rate=round(stats['disagreements'] / stats['compared'], 4)
+                          if stats['compared'] else 0.0)
+                for key, stats in self.stats.items()
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlite_connections import SQLITE_BATCH_SIZE, SQLiteConnections
+
+# How often a process prunes expired and surplus rows from the shared SQLite file
+SHARED_PRUNE_INTERVAL_SECONDS = 30.0
+
+
+def make_cache_key(features: list, model_version: str) -> str:
+    """Canonical cache key for a prepared feature vector and model version.
+
+    json.dumps keeps float repr exact and writes missing values as NaN, so two
+    requests with the same prepared features always produce the same key.
+    """
+    payload = json.dumps(features, separators=(",", ":"), default=str)
+    digest = hashlib.blake2b(payload.encode("utf-8"), digest_size=16)
+    digest.update(b"|")
+    digest.update(model_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """In-process LRU cache with TTL for prediction results.
+
+    When shared_path is set, entries are also written to a SQLite file so that
+    several worker processes on the same host can share results. Keys include
+    the model version, so entries of other versions are never served.
+    The shared file is pruned on write to unexpired rows, at most max_entries of them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, shared_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared_path = shared_path or None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.last_prune = 0.0
+
+        self.shared = None
+        if self.enabled and self.shared_path:
+            self.shared = SQLiteConnections(
+                self.shared_path,
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS predictions_expires_at ON predictions (expires_at);",
+                timeout=5.0
+            )
+            self.shared.get()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _shared_connection(self) -> sqlite3.Connection:
+        return self.shared.get()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: dict):
+        self.set_many({key: value})
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, dict]:
+        """Return the cached values for the keys that are present and not expired."""
+        if not self.enabled:
+            return {}
+
+        now = time.monotonic()
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                if key in found:
+                    continue
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self.entries.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    if entry is not None:
+                        del self.entries[key]
+                    missing.append(key)
+
+        if missing and self.shared_path:
+            shared = self._shared_get_many(missing)
+            if shared:
+                self._local_set_many(shared)
+                found.update(shared)
+                missing = [key for key in missing if key not in shared]
+            with self.lock:
+                self.shared_hits += len(shared)
+
+        with self.lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found
+
+    def set_many(self, items: Dict[str, dict]):
+        if not self.enabled or not items:
+            return
+        self._local_set_many(items)
+        if self.shared_path:
+            self._shared_set_many(items)
+
+    def _local_set_many(self, items: Dict[str, dict]):
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self.lock:
+            for key, value in items.items():
+                self.entries[key] = (value, expires_at)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def _shared_get_many(self, keys: list) -> Dict[str, dict]:
+        # Wall clock here, since expiry times are shared between processes
+        now = time.time()
+        found = {}
+        conn = self._shared_connection()
+        for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+            chunk = keys[start:start + SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT key, value FROM predictions WHERE expires_at > ? AND key IN ({placeholders})",
+                [now, *chunk]
+            )
+            for key, value in rows:
+                found[key] = json.loads(value)
+        return found
+
+    def _shared_set_many(self, items: Dict[str, dict]):
+        expires_at = time.time() + self.ttl_seconds
+        conn = self._shared_connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO predictions (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), expires_at) for key, value in items.items()]
+            )
+        self._prune_shared()
+
+    def _prune_shared(self):
+        """Delete expired rows, then the soonest to expire beyond max_entries."""
+        now = time.time()
+        with self.lock:
+            if now - self.last_prune < SHARED_PRUNE_INTERVAL_SECONDS:
+                return
+            self.last_prune = now
+        conn = self._shared_connection()
+        with conn:
+            conn.execute("DELETE FROM predictions WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM predictions WHERE key IN "
+                "(SELECT key FROM predictions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        """Drop every entry, e.g. after the model changed."""
+        with self.lock:
+            self.entries.clear()
+        if self.enabled and self.shared_path:
+            conn = self._shared_connection()
+            with conn:
+                conn.execute("DELETE FROM predictions")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'shared_backend': self.shared_path,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared_hits': self.shared_hits,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+        }
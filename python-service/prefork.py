@@ -0,0 +1,143 @@
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Optional
+
+import uvicorn
+
+from service_logging import stop_logging
+
+logger = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting counts as a crash loop
+MIN_WORKER_UPTIME_SECONDS = 5.0
+MAX_RESTART_DELAY_SECONDS = 30.0
+
+
+class PreforkServer:
+    """Serve an ASGI app from N forked uvicorn workers sharing one listening socket.
+
+    Whatever the parent loaded before run() (the model in particular) is shared
+    with every worker copy-on-write. gc.freeze() keeps the garbage collector from
+    touching those objects in the workers, which would otherwise copy their pages.
+    Crashed workers are restarted, with a growing delay when they keep crashing.
+    """
+
+    def __init__(self, app, host: str, port: int, workers: int, log_level: Optional[str] = None,
+                 graceful_timeout: float = 30.0):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.sock = None
+        self.children = {}  # pid -> (slot, started_at)
+        self.restart_delays = {}
+        self.stopping = False
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def spawn(self, slot: int):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = (slot, time.monotonic())
+            return
+
+        # Worker process
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # log_level=None leaves uvicorn's loggers to the levels set by configure_logging
+            config = uvicorn.Config(self.app, log_level=self.log_level, log_config=None)
+            uvicorn.Server(config).run(sockets=[self.sock])
+        except BaseException:
+            logger.exception("Worker %d crashed", slot)
+            exit_code = 1
+        finally:
+            stop_logging()
+            os._exit(exit_code)
+
+    def handle_stop(self, signum, _frame):
+        logger.info("Received %s, stopping workers", signal.Signals(signum).name)
+        self.stopping = True
+
+    def reap(self):
+        """Collect exited workers and start replacements."""
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+
+            slot, started_at = self.children.pop(pid, (None, None))
+            if slot is None or self.stopping:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            if time.monotonic() - started_at < MIN_WORKER_UPTIME_SECONDS:
+                delay = min(MAX_RESTART_DELAY_SECONDS, max(1.0, self.restart_delays.get(slot, 0.5) * 2))
+            else:
+                delay = 0.0
+            self.restart_delays[slot] = delay
+            logger.warning("Worker %d (pid %d) exited with code %d, restarting in %.1fs", slot, pid, exit_code, delay)
+            if delay:
+                time.sleep(delay)
+            if not self.stopping:
+                self.spawn(slot)
+
+    def shutdown(self):
+        """Ask workers to finish in-flight requests, then kill whatever is left after graceful_timeout."""
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            logger.warning("Worker pid %d did not stop in time, killing it", pid)
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+            self.children.pop(pid, None)
+
+    def run(self):
+        self.sock = self.bind()
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+
+        # Move everything loaded so far out of the collector's reach before forking
+        gc.collect()
+        gc.freeze()
+
+        logger.info("Starting %d workers on %s:%d (parent pid %d)", self.workers, self.host, self.port, os.getpid())
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+        try:
+            while not self.stopping:
+                self.reap()
+                time.sleep(0.5)
+        finally:
+            self.shutdown()
+            self.sock.close()
+            logger.info("All workers stopped")
@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import threading
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+
+class SQLiteConnections:
+    """Per-thread connections to one SQLite file in WAL mode.
+
+    Connections are reopened after fork, since a SQLite connection must not be
+    shared between processes. The schema script runs on the first connection.
+    """
+
+    def __init__(self, path: str, schema: str = "", timeout: float = 10.0):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self.local = threading.local()
+        self.initialized = False
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.schema and not self.initialized:
+                conn.executescript(self.schema)
+                self.initialized = True
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
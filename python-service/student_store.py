@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlite_connections import SQLITE_BATCH_SIZE, SQLiteConnections
+
+
+class StudentStore:
+    """Last scored feature fingerprint and result per student, persisted in SQLite.
+
+    The fingerprint is the prediction cache key of the student's prepared model
+    row, which already includes the model version. A stored result is reused
+    only while the fingerprint still matches, so a change in any feature or a
+    new model version means the student is scored again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connections = SQLiteConnections(
+            path,
+            "CREATE TABLE IF NOT EXISTS student_scores (student_id TEXT PRIMARY KEY, "
+            "fingerprint TEXT NOT NULL, model_version TEXT NOT NULL, result TEXT NOT NULL, "
+            "scored_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self.reused = 0
+        self.rescored = 0
+        self.without_id = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        return self.connections.get()
+
+    def lookup(self, student_ids: List[Optional[str]], fingerprints: List[str]) -> Dict[int, dict]:
+        """Stored results by batch position, for students whose fingerprint is unchanged."""
+        wanted = sorted({student_id for student_id in student_ids if student_id})
+        stored = {}
+        conn = self._connection()
+        for start in range(0, len(wanted), SQLITE_BATCH_SIZE):
+            chunk = wanted[start:start + SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = conn.execute(
+                f"SELECT student_id, fingerprint, result FROM student_scores WHERE student_id IN ({placeholders})",
+                chunk
+            )
+            for student_id, fingerprint, result in rows:
+                stored[student_id] = (fingerprint, result)
+
+        found = {}
+        for position, (student_id, fingerprint) in enumerate(zip(student_ids, fingerprints)):
+            match = stored.get(student_id) if student_id else None
+            if match is not None and match[0] == fingerprint:
+                found[position] = json.loads(match[1])
+
+        # Rows without a studentId are never eligible for reuse, so they are not counted as rescored
+        with_id = sum(1 for student_id in student_ids if student_id)
+        with self.lock:
+            self.reused += len(found)
+            self.rescored += with_id - len(found)
+            self.without_id += len(student_ids) - with_id
+        return found
+
+    def save(self, items: Dict[str, Tuple[str, dict]], model_version: str):
+        """Store the latest fingerprint and result for each student id."""
+        if not items:
+            return
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO student_scores (student_id, fingerprint, model_version, result, scored_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (student_id, fingerprint, model_version, json.dumps(result), now)
+                    for student_id, (fingerprint, result) in items.items()
+                ]
+            )
+
+    def stats(self) -> dict:
+        return {'path': self.path, 'reused': self.reused, 'rescored': self.rescored, 'without_id': self.without_id}
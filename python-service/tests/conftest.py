@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+# The service is a flat set of modules, imported the way app.py imports them
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVICE_DIR)
+
+# Keep the service's SQLite stores out of the source tree and its logs quiet
+DATA_DIR = tempfile.mkdtemp(prefix="dropout-service-tests-")
+os.environ.setdefault("STUDENT_STORE_PATH", os.path.join(DATA_DIR, "student_scores.sqlite3"))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("MODEL_WATCH_INTERVAL_SECONDS", "0")
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient for the service, once the model is loaded and warmed up."""
+    from fastapi.testclient import TestClient
+
+    import app
+
+    with TestClient(app.app) as test_client:
+        deadline = time.monotonic() + 120
+        while test_client.get("/readyz").status_code != 200:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Service did not become ready")
+            time.sleep(0.05)
+        yield test_client
+
+
+@pytest.fixture
+def payloads():
+    """Valid /predict bodies, as JSON-ready dicts."""
+    import app
+
+    return [app.synthetic_request(i).model_dump(exclude_none=True) for i in range(40)]
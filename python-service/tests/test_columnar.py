@@ -0,0 +1,23 @@
+import pytest
+
+
+def row_and_columnar(client, payload):
+    """The same one-row batch sent as rows and as columns."""
+    rows = client.post("/batch-predict", json={'predictions': [payload]})
+    columns = client.post("/batch-predict", json={'columns': {name: [value] for name, value in payload.items()}},
+                          params={'response_format': 'rows'})
+    return rows, columns
+
+
+@pytest.mark.parametrize("nationality", [
+    1e20, -1e20, 9.3e18, float(2 ** 63), -float(2 ** 63), 2 ** 70, -2 ** 70, 2 ** 63, 2 ** 60 + 1, 2 ** 53 + 1,
+    "123456789012345678901234567890"
+])
+def test_large_integers_validate_alike(client, payloads, nationality):
+    rows, columns = row_and_columnar(client, dict(payloads[0], nationality=nationality))
+
+    assert columns.status_code == rows.status_code
+    if rows.status_code == 422:
+        assert [error['msg'] for error in columns.json()['detail']] == [error['msg'] for error in rows.json()['detail']]
+    else:
+        assert columns.json()['predictions'] == rows.json()['predictions']
@@ -0,0 +1,50 @@
+import time
+
+import app
+
+
+def wait_for_status(client, job_id: str, statuses: tuple) -> dict:
+    deadline = time.monotonic() + 60
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job['status'] in statuses or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def follow_pages(client, job_id: str, limit: int, max_pages: int = 20) -> list:
+    """Every page until next_offset is null, as the API documents."""
+    pages = []
+    offset = 0
+    while offset is not None and len(pages) < max_pages:
+        page = client.get(f"/jobs/{job_id}/results", params={'offset': offset, 'limit': limit}).json()
+        pages.append(page)
+        offset = page['next_offset']
+    return pages
+
+
+def test_paging_a_failed_job_stops(client, payloads, monkeypatch):
+    monkeypatch.setattr(app, "JOB_CHUNK_SIZE", 10)
+    score_chunk = app.job_runner.score_chunk
+
+    def fail_second_chunk(chunk):
+        if chunk['chunk_index'] == 1:
+            raise RuntimeError("scoring failed")
+        return score_chunk(chunk)
+
+    monkeypatch.setattr(app.job_runner, "score_chunk", fail_second_chunk)
+    job = client.post("/jobs", json={'predictions': payloads}).json()
+    assert wait_for_status(client, job['job_id'], ("failed", "completed"))['status'] == "failed"
+
+    for limit in (4, 5, 1000):
+        pages = follow_pages(client, job['job_id'], limit)
+        assert pages[-1]['next_offset'] is None
+        assert [result['index'] for page in pages for result in page['results']] == list(range(10))
+
+
+def test_paging_a_completed_job_returns_every_row(client, payloads):
+    job = client.post("/jobs", json={'predictions': payloads}).json()
+    assert wait_for_status(client, job['job_id'], ("failed", "completed"))['status'] == "completed"
+
+    pages = follow_pages(client, job['job_id'], 7)
+    assert [result['index'] for page in pages for result in page['results']] == list(range(len(payloads)))
@@ -0,0 +1,12 @@
+import app
+
+
+def test_loading_another_model_keeps_cached_predictions(client, payloads):
+    client.post("/batch-predict", json={'predictions': payloads})
+    entries = app.prediction_cache.stats()['entries']
+    assert entries >= len(payloads)
+
+    app.model_registry.load("catboost-model1")
+
+    assert app.prediction_cache.stats()['entries'] == entries
+    assert client.post("/predict", json=payloads[0]).status_code == 200
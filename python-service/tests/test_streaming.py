@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import app
+
+
+def ndjson(payloads) -> str:
+    return "".join(json.dumps(payload) + "\n" for payload in payloads)
+
+
+def test_stream_retries_chunks_while_pool_is_full(client, payloads, monkeypatch):
+    monkeypatch.setattr(app, "STREAM_CHUNK_SIZE", 10)
+    run_inference = app.run_inference
+    calls = []
+
+    async def full_then_free(func, *args):
+        calls.append(func)
+        if len(calls) % 2:
+            raise app.InferenceUnavailable(status_code=429, detail="Inference queue is full, please retry later")
+        return await run_inference(func, *args)
+
+    monkeypatch.setattr(app, "run_inference", full_then_free)
+    response = client.post("/batch-predict/stream", content=ndjson(payloads),
+                           headers={"content-type": "application/x-ndjson"})
+
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert [result['index'] for result in results] == list(range(len(payloads)))
+    assert not [result for result in results if 'error' in result]
+    assert len(calls) == 2 * len(payloads) // 10
+
+
+def test_stream_fails_at_once_on_timeout(client, payloads, monkeypatch):
+    calls = []
+
+    async def timed_out(func, *args):
+        calls.append(func)
+        raise HTTPException(status_code=503, detail="Inference timed out, please retry later")
+
+    monkeypatch.setattr(app, "run_inference", timed_out)
+    with pytest.raises(Exception):
+        client.post("/batch-predict/stream", content=ndjson(payloads), headers={"content-type": "application/x-ndjson"})
+    assert len(calls) == 1
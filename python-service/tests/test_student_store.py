@@ -0,0 +1,13 @@
+from student_store import StudentStore
+
+
+def test_rows_without_student_id_are_not_counted_as_rescored(tmp_path):
+    store = StudentStore(str(tmp_path / "scores.sqlite3"))
+    store.save({'s1': ("fp1", {'prediction': 'dropout'}), 's2': ("fp2", {'prediction': 'not_dropout'})}, "v1")
+
+    found = store.lookup(["s1", "s2", None, "", "s3"], ["fp1", "changed", "fp4", "fp5", "fp6"])
+
+    assert found == {0: {'prediction': 'dropout'}}
+    assert store.stats()['reused'] == 1
+    assert store.stats()['rescored'] == 2
+    assert store.stats()['without_id'] == 2
@@ -0,0 +1,60 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+import app
+from tree_evaluator import TreeEvaluator, export_model_arrays, load_model_arrays, save_model_arrays
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+N_ROWS = 5000
+
+
+@pytest.fixture(scope="module", params=["catboost-model.pkl", "catboost-model1.pkl"])
+def shipped_model(request, tmp_path_factory):
+    """A shipped CatBoost model, its evaluator loaded back from saved .npz arrays, and the model path."""
+    model_path = os.path.join(MODELS_DIR, request.param)
+    model = joblib.load(model_path)
+    arrays_path = str(tmp_path_factory.mktemp("arrays") / "model.npz")
+    save_model_arrays(export_model_arrays(model), arrays_path)
+    return model, TreeEvaluator(load_model_arrays(arrays_path)), model_path
+
+
+@pytest.fixture(scope="module")
+def frame(shipped_model):
+    model, _, model_path = shipped_model
+    return app.evaluator_check_frame(model, model_path, N_ROWS)
+
+
+def test_sample_covers_every_feature(shipped_model, frame):
+    model, _, _ = shipped_model
+    for column in frame.columns:
+        assert frame[column].astype(str).nunique() > 1, column
+    for j in model.get_cat_feature_indices():
+        assert frame.iloc[:, j].str.startswith("unseen_").any(), frame.columns[j]
+
+
+def test_raw_values_match_catboost(shipped_model, frame):
+    model, evaluator, _ = shipped_model
+    expected = model.predict(frame, prediction_type="RawFormulaVal")
+    np.testing.assert_array_equal(evaluator.raw_formula_val(frame), expected)
+
+
+def test_probabilities_match_catboost(shipped_model, frame):
+    model, evaluator, _ = shipped_model
+    np.testing.assert_allclose(evaluator.predict_proba(frame), model.predict_proba(frame), rtol=0, atol=1e-12)
+
+
+def test_single_rows_match_batch(shipped_model, frame):
+    _, evaluator, _ = shipped_model
+    rows = frame.head(50).to_numpy(dtype=object).tolist()
+    singles = np.vstack([evaluator.predict_proba([row]) for row in rows])
+    np.testing.assert_array_equal(singles, evaluator.predict_proba(frame.head(50)))
+
+
+def test_model_interface(shipped_model):
+    model, evaluator, _ = shipped_model
+    assert evaluator.classes_.tolist() == model.classes_.tolist()
+    assert evaluator.feature_names_ == model.feature_names_
+    assert list(evaluator.get_cat_feature_indices()) == list(model.get_cat_feature_indices())
@@ -0,0 +1,626 @@
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+
+# Bumped whenever the array layout written by export_model_arrays changes
+ARRAYS_FORMAT_VERSION = 1
+
+# Rows scored per block, so the (trees x rows) intermediates stay small
+BLOCK_ROWS = 4096
+# Projection combination codes are renumbered once they could exceed max(block rows, this)
+COMBINATION_LIMIT = 1024
+
+# Split and projection element kinds
+FLOAT_SPLIT, ONE_HOT_SPLIT, CTR_SPLIT = 0, 1, 2
+CAT_VALUE, FLOAT_BORDER, CAT_EXACT_VALUE = 0, 1, 2
+
+# CTR table statistics are read differently per CTR type
+CTR_TYPES = {'Borders': 0, 'Buckets': 1, 'Counter': 2, 'FeatureFreq': 2}
+CTR_BORDERS, CTR_BUCKETS, CTR_COUNTER = 0, 1, 2
+
+# Key CatBoost's JSON export writes for empty hash table slots
+EMPTY_CTR_HASH = 0xFFFFFFFFFFFFFFFF
+CTR_HASH_MAGIC = np.uint64(0x4906BA494954CB65)
+
+
+# CityHash64 (v1.0), which CatBoost truncates to 32 bits for categorical values
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+_K0 = 0xC3A5C85C97CB3127
+_K1 = 0xB492B66FBE98F273
+_K2 = 0x9AE16A3B2F90404F
+_K3 = 0xC949D7C7509E6557
+_KMUL = 0x9DDFEA08EB382D69
+
+
+def _fetch64(data: bytes, i: int) -> int:
+    return int.from_bytes(data[i:i + 8], "little")
+
+
+def _fetch32(data: bytes, i: int) -> int:
+    return int.from_bytes(data[i:i + 4], "little")
+
+
+def _rotate(value: int, shift: int) -> int:
+    return value if shift == 0 else ((value >> shift) | (value << (64 - shift))) & _MASK64
+
+
+def _shift_mix(value: int) -> int:
+    return value ^ (value >> 47)
+
+
+def _hash_len16(u: int, v: int) -> int:
+    a = ((u ^ v) * _KMUL) & _MASK64
+    a ^= a >> 47
+    b = ((v ^ a) * _KMUL) & _MASK64
+    b ^= b >> 47
+    return (b * _KMUL) & _MASK64
+
+
+def _hash_len0to16(data: bytes) -> int:
+    n = len(data)
+    if n > 8:
+        a = _fetch64(data, 0)
+        b = _fetch64(data, n - 8)
+        return _hash_len16(a, _rotate((b + n) & _MASK64, n)) ^ b
+    if n >= 4:
+        return _hash_len16((n + (_fetch32(data, 0) << 3)) & _MASK64, _fetch32(data, n - 4))
+    if n > 0:
+        y = data[0] + (data[n >> 1] << 8)
+        z = n + (data[n - 1] << 2)
+        return (_shift_mix(((y * _K2) ^ (z * _K3)) & _MASK64) * _K2) & _MASK64
+    return _K2
+
+
+def _hash_len17to32(data: bytes) -> int:
+    n = len(data)
+    a = (_fetch64(data, 0) * _K1) & _MASK64
+    b = _fetch64(data, 8)
+    c = (_fetch64(data, n - 8) * _K2) & _MASK64
+    d = (_fetch64(data, n - 16) * _K0) & _MASK64
+    return _hash_len16(
+        (_rotate((a - b) & _MASK64, 43) + _rotate(c, 30) + d) & _MASK64,
+        (a + _rotate(b ^ _K3, 20) - c + n) & _MASK64
+    )
+
+
+def _weak_hash_len32(data: bytes, i: int, a: int, b: int):
+    w, x, y, z = (_fetch64(data, i + offset) for offset in (0, 8, 16, 24))
+    a = (a + w) & _MASK64
+    b = _rotate((b + a + z) & _MASK64, 21)
+    c = a
+    a = (a + x + y) & _MASK64
+    b = (b + _rotate(a, 44)) & _MASK64
+    return (a + z) & _MASK64, (b + c) & _MASK64
+
+
+def _hash_len33to64(data: bytes) -> int:
+    n = len(data)
+    z = _fetch64(data, 24)
+    a = (_fetch64(data, 0) + (n + _fetch64(data, n - 16)) * _K0) & _MASK64
+    b = _rotate((a + z) & _MASK64, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(data, 8)) & _MASK64
+    c = (c + _rotate(a, 7)) & _MASK64
+    a = (a + _fetch64(data, 16)) & _MASK64
+    vf = (a + z) & _MASK64
+    vs = (b + _rotate(a, 31) + c) & _MASK64
+    a = (_fetch64(data, 16) + _fetch64(data, n - 32)) & _MASK64
+    z = _fetch64(data, n - 8)
+    b = _rotate((a + z) & _MASK64, 52)
+    c = _rotate(a, 37)
+    a = (a + _fetch64(data, n - 24)) & _MASK64
+    c = (c + _rotate(a, 7)) & _MASK64
+    a = (a + _fetch64(data, n - 16)) & _MASK64
+    wf = (a + z) & _MASK64
+    ws = (b + _rotate(a, 31) + c) & _MASK64
+    r = _shift_mix(((vf + ws) * _K2 + (wf + vs) * _K0) & _MASK64)
+    return (_shift_mix((r * _K0 + vs) & _MASK64) * _K2) & _MASK64
+
+
+def city_hash64(data: bytes) -> int:
+    n = len(data)
+    if n <= 16:
+        return _hash_len0to16(data)
+    if n <= 32:
+        return _hash_len17to32(data)
+    if n <= 64:
+        return _hash_len33to64(data)
+
+    x = _fetch64(data, 0)
+    y = _fetch64(data, n - 16) ^ _K1
+    z = _fetch64(data, n - 56) ^ _K0
+    v = _weak_hash_len32(data, n - 64, n, y)
+    w = _weak_hash_len32(data, n - 32, (n * _K1) & _MASK64, _K0)
+    z = (z + _shift_mix(v[1]) * _K1) & _MASK64
+    x = (_rotate((z + x) & _MASK64, 39) * _K1) & _MASK64
+    y = (_rotate(y, 33) * _K1) & _MASK64
+    for i in range(0, (n - 1) & ~63, 64):
+        x = (_rotate((x + y + v[0] + _fetch64(data, i + 16)) & _MASK64, 37) * _K1) & _MASK64
+        y = (_rotate((y + v[1] + _fetch64(data, i + 48)) & _MASK64, 42) * _K1) & _MASK64
+        x ^= w[1]
+        y ^= v[0]
+        z = _rotate(z ^ w[0], 33)
+        v = _weak_hash_len32(data, i, (v[1] * _K1) & _MASK64, (x + w[0]) & _MASK64)
+        w = _weak_hash_len32(data, i + 32, (z + w[1]) & _MASK64, y)
+        z, x = x, z
+    return _hash_len16(
+        (_hash_len16(v[0], w[0]) + _shift_mix(y) * _K1 + z) & _MASK64,
+        (_hash_len16(v[1], w[1]) + x) & _MASK64
+    )
+
+
+@lru_cache(maxsize=65536)
+def cat_feature_hash(value: str) -> int:
+    """CatBoost's hash of a categorical value: the low 32 bits of CityHash64, signed."""
+    hashed = city_hash64(value.encode("utf-8")) & 0xFFFFFFFF
+    return hashed - (1 << 32) if hashed >= 1 << 31 else hashed
+
+
+# Export
+def export_model_arrays(model) -> Dict[str, np.ndarray]:
+    """Flatten a CatBoost model into plain NumPy arrays for TreeEvaluator.
+
+    Reads the model's JSON export, so catboost is only needed here and not for
+    scoring. Categorical features keep CatBoost's hashing: one-hot splits compare
+    value hashes, and CTR splits look up projection hashes in the learned CTR
+    tables. Raises ValueError for model features the evaluator does not support.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.json")
+        model.save_model(path, format="json")
+        with open(path) as f:
+            description = json.load(f)
+
+    features = description['features_info']
+    float_features = features.get('float_features', [])
+    cat_features = features.get('categorical_features', [])
+    ctrs = features.get('ctrs', [])
+    if features.get('text_features') or features.get('embedding_features'):
+        raise ValueError("Text and embedding features are not supported")
+    trees = description.get('oblivious_trees')
+    if not trees or any(len(tree['leaf_values']) != 1 << len(tree['splits']) for tree in trees):
+        raise ValueError("Only binary classifiers made of oblivious trees are supported")
+
+    # Every binary split in CatBoost's order: float borders, one-hot values, CTR borders
+    binary_splits = []
+    for feature in float_features:
+        binary_splits += [(FLOAT_SPLIT, feature['feature_index'], border, 0) for border in feature.get('borders') or []]
+    for feature in cat_features:
+        binary_splits += [(ONE_HOT_SPLIT, feature['feature_index'], 0.0, value) for value in feature.get('values', [])]
+    for ctr_index, ctr in enumerate(ctrs):
+        binary_splits += [(CTR_SPLIT, ctr_index, border, 0) for border in ctr['borders']]
+
+    used_splits = sorted({split['split_index'] for tree in trees for split in tree['splits']})
+    condition_of = {split_index: position for position, split_index in enumerate(used_splits)}
+    conditions = [binary_splits[split_index] for split_index in used_splits]
+
+    # Only CTRs that some split uses are computed; the rest are dropped
+    used_ctrs = sorted({feature for kind, feature, _, _ in conditions if kind == CTR_SPLIT})
+    ctr_of = {ctr_index: position for position, ctr_index in enumerate(used_ctrs)}
+    conditions = [
+        (kind, ctr_of[feature] if kind == CTR_SPLIT else feature, border, value)
+        for kind, feature, border, value in conditions
+    ]
+
+    projections, projection_of = [], {}
+    tables, table_of = [], {}
+    ctr_rows = []
+    for ctr_index in used_ctrs:
+        ctr = ctrs[ctr_index]
+        if ctr['ctr_type'] not in CTR_TYPES:
+            raise ValueError(f"Unsupported CTR type: {ctr['ctr_type']}")
+
+        elements = tuple(
+            (CAT_VALUE, element['cat_feature_index'], 0.0, 0) if element['combination_element'] == 'cat_feature_value'
+            else (FLOAT_BORDER, element['float_feature_index'], element['border'], 0)
+            if element['combination_element'] == 'float_feature'
+            else (CAT_EXACT_VALUE, element['cat_feature_index'], 0.0, element['value'])
+            for element in ctr['elements']
+        )
+        if elements not in projection_of:
+            projection_of[elements] = len(projections)
+            projections.append(elements)
+        if ctr['identifier'] not in table_of:
+            table_of[ctr['identifier']] = len(tables)
+            tables.append(description['ctr_data'][ctr['identifier']])
+
+        ctr_rows.append((
+            projection_of[elements], table_of[ctr['identifier']], CTR_TYPES[ctr['ctr_type']], ctr['target_border_idx'],
+            (ctr['prior_numerator'], ctr['prior_denomerator'], ctr['shift'], ctr['scale'])
+        ))
+
+    # CTR tables as sorted hash keys with their counter rows, concatenated
+    stats_width = max((table['hash_stride'] - 1 for table in tables), default=1)
+    table_keys, table_stats, table_offsets = [], [], [0]
+    for table in tables:
+        stride = table['hash_stride']
+        hash_map = table['hash_map']
+        entries = sorted(
+            (int(hash_map[i]), hash_map[i + 1:i + stride])
+            for i in range(0, len(hash_map), stride)
+            if int(hash_map[i]) != EMPTY_CTR_HASH
+        )
+        table_keys += [key for key, _ in entries]
+        table_stats += [counters + [0] * (stats_width - len(counters)) for _, counters in entries]
+        table_offsets.append(len(table_keys))
+
+    feature_names = {}
+    for feature in float_features + cat_features:
+        feature_names[feature['flat_feature_index']] = feature.get('feature_id') or str(feature['flat_feature_index'])
+    class_names = getattr(model, "classes_", None)
+
+    scale, biases = description.get('scale_and_bias', [1.0, [0.0]])
+    return {
+        'format_version': np.array(ARRAYS_FORMAT_VERSION),
+        'class_names': np.array(list(class_names) if class_names is not None else [0, 1]),
+        'feature_names': np.array([feature_names.get(i, str(i)) for i in range(max(feature_names, default=-1) + 1)]),
+        'float_columns': np.array([feature['flat_feature_index'] for feature in float_features], dtype=np.int32),
+        'float_nan_true': np.array([feature.get('nan_value_treatment') == 'AsTrue' for feature in float_features]),
+        'cat_columns': np.array([feature['flat_feature_index'] for feature in cat_features], dtype=np.int32),
+        'condition_kind': np.array([kind for kind, _, _, _ in conditions], dtype=np.int8),
+        'condition_feature': np.array([feature for _, feature, _, _ in conditions], dtype=np.int32),
+        'condition_border': np.array([border for _, _, border, _ in conditions], dtype=np.float32),
+        'condition_value': np.array([value for _, _, _, value in conditions], dtype=np.int64),
+        'tree_depth': np.array([len(tree['splits']) for tree in trees], dtype=np.int32),
+        'tree_conditions': np.array(
+            [condition_of[split['split_index']] for tree in trees for split in tree['splits']], dtype=np.int32
+        ),
+        'leaf_values': np.array([value for tree in trees for value in tree['leaf_values']], dtype=np.float64),
+        'scale_and_bias': np.array([scale, biases[0] if biases else 0.0], dtype=np.float64),
+        'ctr_projection': np.array([row[0] for row in ctr_rows], dtype=np.int32),
+        'ctr_table': np.array([row[1] for row in ctr_rows], dtype=np.int32),
+        'ctr_type': np.array([row[2] for row in ctr_rows], dtype=np.int8),
+        'ctr_target_border': np.array([row[3] for row in ctr_rows], dtype=np.int32),
+        'ctr_params': np.array([row[4] for row in ctr_rows], dtype=np.float32).reshape(-1, 4),
+        'projection_offsets': np.cumsum([0] + [len(elements) for elements in projections]).astype(np.int32),
+        'projection_kind': np.array([e[0] for elements in projections for e in elements], dtype=np.int8),
+        'projection_feature': np.array([e[1] for elements in projections for e in elements], dtype=np.int32),
+        'projection_border': np.array([e[2] for elements in projections for e in elements], dtype=np.float32),
+        'projection_value': np.array([e[3] for elements in projections for e in elements], dtype=np.int64),
+        'table_offsets': np.array(table_offsets, dtype=np.int64),
+        'table_keys': np.array(table_keys, dtype=np.uint64),
+        'table_stats': np.array(table_stats, dtype=np.int64).reshape(-1, stats_width),
+        'table_denominator': np.array([table.get('counter_denominator', 0) for table in tables], dtype=np.int64),
+    }
+
+
+def save_model_arrays(arrays: Dict[str, np.ndarray], path: str):
+    np.savez_compressed(path, **arrays)
+
+
+def load_model_arrays(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as data:
+        arrays = {name: data[name] for name in data.files}
+    if int(arrays.get('format_version', -1)) != ARRAYS_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model arrays format in {path}")
+    return arrays
+
+
+class TreeEvaluator:
+    """Vectorized NumPy scorer for a CatBoost binary classifier exported with export_model_arrays.
+
+    Takes rows in model column order, like predict_proba: float columns as
+    numbers with NaN for missing values and categorical columns as strings.
+    Floats are compared and CTRs computed in float32 as in CatBoost, so raw
+    formula values match the model exactly; probabilities can differ from
+    model.predict_proba in the last bit because of the exponent.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        for name, values in arrays.items():
+            setattr(self, name, values)
+        self._index_trees()
+        self._index_float_bits()
+        self._index_projections()
+        self._index_ctr_tables()
+
+    @classmethod
+    def from_model(cls, model) -> "TreeEvaluator":
+        return cls(export_model_arrays(model))
+
+    @classmethod
+    def load(cls, path: str) -> "TreeEvaluator":
+        return cls(load_model_arrays(path))
+
+    # Lookup structures derived from the exported arrays
+    def _index_trees(self):
+        # One row of condition indexes per tree; shallower trees point at an always-false row
+        self.n_conditions = len(self.condition_kind)
+        max_depth = int(self.tree_depth.max(initial=0))
+        self.tree_matrix = np.full((len(self.tree_depth), max_depth), self.n_conditions, dtype=np.int32)
+        start = 0
+        for tree, depth in enumerate(self.tree_depth):
+            self.tree_matrix[tree, :depth] = self.tree_conditions[start:start + depth]
+            start += depth
+        self.leaf_offsets = np.concatenate(([0], np.cumsum(1 << self.tree_depth.astype(np.int64))[:-1]))
+
+        self.one_hot_conditions = np.flatnonzero(self.condition_kind == ONE_HOT_SPLIT)
+        self.ctr_conditions = np.flatnonzero(self.condition_kind == CTR_SPLIT)
+
+    def _index_float_bits(self):
+        # Float splits and float elements of CTR projections share one (feature, border) list
+        pairs = {}
+
+        def bit_index(feature, border):
+            return pairs.setdefault((int(feature), np.float32(border).tobytes()), len(pairs))
+
+        self.float_conditions = np.flatnonzero(self.condition_kind == FLOAT_SPLIT)
+        self.float_condition_bits = np.array([
+            bit_index(self.condition_feature[i], self.condition_border[i]) for i in self.float_conditions
+        ], dtype=np.int64)
+        projection_floats = np.flatnonzero(self.projection_kind == FLOAT_BORDER)
+        self.projection_float_bits = np.array([
+            bit_index(self.projection_feature[i], self.projection_border[i]) for i in projection_floats
+        ], dtype=np.int64)
+
+        self.bit_feature = np.array([feature for feature, _ in pairs], dtype=np.int64)
+        self.bit_border = np.array([np.frombuffer(border, dtype=np.float32)[0] for _, border in pairs], dtype=np.float32)
+        self.bit_nan_true = self.float_nan_true[self.bit_feature] if len(pairs) else np.zeros(0, dtype=bool)
+
+    def _index_projections(self):
+        # Hash inputs are rows of small codes: categorical value codes, float bits, then exact-value bits
+        n_cat = len(self.cat_columns)
+        float_elements = np.flatnonzero(self.projection_kind == FLOAT_BORDER)
+        self.source_float_bits, float_sources = np.unique(self.projection_float_bits, return_inverse=True)
+        exact_elements = np.flatnonzero(self.projection_kind == CAT_EXACT_VALUE)
+        exact_pairs = {}
+        for i in exact_elements:
+            exact_pairs.setdefault((int(self.projection_feature[i]), int(self.projection_value[i])), len(exact_pairs))
+        self.exact_feature = np.array([feature for feature, _ in exact_pairs], dtype=np.int64)
+        self.exact_value = np.array([value for _, value in exact_pairs], dtype=np.int64)
+
+        source = self.projection_feature.astype(np.int64)
+        source[float_elements] = n_cat + float_sources.ravel()
+        source[exact_elements] = [
+            n_cat + len(self.source_float_bits) + exact_pairs[(int(self.projection_feature[i]), int(self.projection_value[i]))]
+            for i in exact_elements
+        ]
+        self.n_sources = n_cat + len(self.source_float_bits) + len(exact_pairs)
+
+        sequences = [
+            tuple(source[start:stop].tolist())
+            for start, stop in zip(self.projection_offsets[:-1], self.projection_offsets[1:])
+        ]
+        lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+        self.projection_lengths = lengths
+        self.projection_sources = np.zeros((len(sequences), int(lengths.max(initial=0))), dtype=np.int64)
+        for projection, sequence in enumerate(sequences):
+            self.projection_sources[projection, :len(sequence)] = sequence
+
+        # Projections sharing a prefix share its combination codes: one trie level per position
+        nodes = {}
+        self.trie_levels = []
+        for position in range(self.projection_sources.shape[1]):
+            prefixes = sorted({sequence[:position + 1] for sequence in sequences if len(sequence) > position})
+            start = len(nodes)
+            for prefix in prefixes:
+                nodes[prefix] = len(nodes)
+            parents = np.array([nodes[prefix[:-1]] for prefix in prefixes], dtype=np.int64) if position else None
+            self.trie_levels.append((start, len(nodes), parents, np.array([prefix[-1] for prefix in prefixes], dtype=np.int64)))
+        self.n_nodes = len(nodes)
+        self.projection_node = np.array([nodes[sequence] for sequence in sequences], dtype=np.int64)
+
+    def _index_ctr_tables(self):
+        n_tables = len(self.table_offsets) - 1
+        self.table_sizes = np.diff(self.table_offsets)
+
+        # All tables share one open-addressing hash table; keys are salted per table so that
+        # equal keys of different tables land in different slots, and the table is checked on lookup
+        entry_table = np.repeat(np.arange(n_tables), self.table_sizes)
+        self.table_salt = np.arange(n_tables, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        salted = self.table_keys ^ self.table_salt[entry_table]
+        slot_bits = max(4, (8 * len(salted)).bit_length())
+        self.slot_shift = np.uint64(64 - slot_bits)
+        self.slot_mask = (1 << slot_bits) - 1
+        self.slot_key = np.zeros(1 << slot_bits, dtype=np.uint64)
+        self.slot_table = np.full(1 << slot_bits, -1, dtype=np.int64)
+        self.slot_entry = np.zeros(1 << slot_bits, dtype=np.int64)
+        entries = np.arange(len(salted)) - self.table_offsets[entry_table]
+        for key, table, entry, slot in zip(salted, entry_table, entries, (salted >> self.slot_shift).astype(np.int64)):
+            while self.slot_table[slot] != -1:
+                slot = (slot + 1) & self.slot_mask
+            self.slot_key[slot], self.slot_table[slot], self.slot_entry[slot] = key, table, entry
+
+        # Each CTR's value for every entry of its table, plus the value for unseen hashes at the end
+        values, offsets = [], [0]
+        for ctr, table in enumerate(self.ctr_table):
+            start, stop = self.table_offsets[table], self.table_offsets[table + 1]
+            stats = np.vstack((self.table_stats[start:stop], np.zeros((1, self.table_stats.shape[1]), dtype=np.int64)))
+            target_border = self.ctr_target_border[ctr]
+            if self.ctr_type[ctr] == CTR_COUNTER:
+                good = stats[:, 0]
+                total = np.full(len(stats), self.table_denominator[table])
+                total[-1] = 0
+            elif self.ctr_type[ctr] == CTR_BUCKETS:
+                good = stats[:, target_border]
+                total = stats.sum(axis=1)
+            else:
+                good = stats[:, target_border + 1:].sum(axis=1)
+                total = stats.sum(axis=1)
+            prior_numerator, prior_denominator, shift, scale = self.ctr_params[ctr]
+            values.append(((good.astype(np.float32) + prior_numerator) / (total.astype(np.float32) + prior_denominator)
+                           + shift) * scale)
+            offsets.append(offsets[-1] + len(stats))
+        self.ctr_value_offsets = np.array(offsets[:-1], dtype=np.int64)
+        self.ctr_values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+
+    # Model interface used by the service
+    @property
+    def classes_(self) -> np.ndarray:
+        return self.class_names
+
+    @property
+    def feature_names_(self) -> list:
+        return self.feature_names.tolist()
+
+    @property
+    def n_features_in_(self) -> int:
+        return len(self.feature_names)
+
+    def get_cat_feature_indices(self) -> list:
+        return sorted(self.cat_columns.tolist())
+
+    # Scoring
+    def predict_proba(self, data) -> np.ndarray:
+        """Class probabilities, shape (rows, 2), for a DataFrame or a list of rows."""
+        probability = 1.0 / (1.0 + np.exp(-self.raw_formula_val(data)))
+        return np.column_stack((1.0 - probability, probability))
+
+    def raw_formula_val(self, data) -> np.ndarray:
+        if not len(data):
+            return np.zeros(0, dtype=np.float64)
+        floats, hashes, codes, categories = self._feature_arrays(data)
+        result = np.empty(floats.shape[1], dtype=np.float64)
+        for start in range(0, len(result), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            result[block] = self._score_block(floats[:, block], hashes[:, block], codes[:, block], categories)
+        scale, bias = self.scale_and_bias
+        return scale * result + bias
+
+    def _feature_arrays(self, data):
+        """Feature arrays, each shaped (features, rows).
+
+        Returns float features as float32, categorical hashes as int64, and
+        categorical values as codes into the input's distinct values, with
+        (hashes of the distinct values, offset of each feature's values, count
+        of each feature's values) to decode them.
+        """
+        if hasattr(data, "iloc"):
+            column = lambda j: data.iloc[:, j].to_numpy()
+        else:
+            rows = np.empty((len(data), self.n_features_in_), dtype=object)
+            rows[:] = data
+            column = lambda j: rows[:, j]
+
+        n_rows = len(data)
+        floats = np.empty((len(self.float_columns), n_rows), dtype=np.float32)
+        for i, j in enumerate(self.float_columns):
+            floats[i] = np.asarray(column(j), dtype=np.float64)
+
+        # Categorical columns hold few distinct values, so each is hashed once
+        codes = np.empty((len(self.cat_columns), n_rows), dtype=np.int32)
+        value_hashes = []
+        for i, j in enumerate(self.cat_columns):
+            values, codes[i] = np.unique(np.asarray(column(j)).astype(str), return_inverse=True)
+            value_hashes.append(np.array([cat_feature_hash(value) for value in values], dtype=np.int64))
+        counts = np.array([len(values) for values in value_hashes], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+        flat_hashes = np.concatenate(value_hashes) if value_hashes else np.zeros(0, dtype=np.int64)
+        hashes = flat_hashes[codes + offsets[:, None]]
+        return floats, hashes, codes, (flat_hashes, offsets, counts)
+
+    def _score_block(self, floats: np.ndarray, hashes: np.ndarray, codes: np.ndarray, categories) -> np.ndarray:
+        n_rows = floats.shape[1]
+        values = floats[self.bit_feature]
+        bits = values > self.bit_border[:, None]
+        if self.bit_nan_true.any():
+            bits |= np.isnan(values) & self.bit_nan_true[:, None]
+
+        conditions = np.zeros((self.n_conditions + 1, n_rows), dtype=bool)
+        conditions[self.float_conditions] = bits[self.float_condition_bits]
+        selected = self.one_hot_conditions
+        conditions[selected] = hashes[self.condition_feature[selected]] == self.condition_value[selected, None]
+        selected = self.ctr_conditions
+        if len(selected):
+            ctr_values = self._ctr_block(bits, hashes, codes, categories)
+            conditions[selected] = ctr_values[self.condition_feature[selected]] > self.condition_border[selected, None]
+
+        leaf_index = np.zeros((len(self.tree_depth), n_rows), dtype=np.int64)
+        for depth in range(self.tree_matrix.shape[1]):
+            leaf_index |= conditions[self.tree_matrix[:, depth]].astype(np.int64) << depth
+        leaf_index += self.leaf_offsets[:, None]
+        # Trees are added in model order, as CatBoost does
+        return self.leaf_values[leaf_index].sum(axis=0)
+
+    def _ctr_block(self, bits: np.ndarray, hashes: np.ndarray, codes: np.ndarray, categories) -> np.ndarray:
+        """CTR values, shape (ctrs, rows).
+
+        Rows are reduced to one combination code per projection, and only the
+        combinations present in the block are hashed and looked up, since
+        projections mix few low-cardinality inputs.
+        """
+        flat_hashes, category_offsets, category_counts = categories
+        n_rows = bits.shape[1]
+        n_cat = len(codes)
+        sources = np.concatenate((
+            codes, bits[self.source_float_bits], hashes[self.exact_feature] == self.exact_value[:, None]
+        ), dtype=np.int32)
+        radix = np.concatenate((category_counts, np.full(self.n_sources - n_cat, 2, dtype=np.int64)))
+
+        # Combination codes along the projection trie; codes past the limit are renumbered
+        limit = max(n_rows, COMBINATION_LIMIT)
+        node_codes = np.empty((self.n_nodes, n_rows), dtype=np.int32)
+        node_sizes = np.empty(self.n_nodes, dtype=np.int64)
+        for start, stop, parents, source in self.trie_levels:
+            if parents is None:
+                level_codes, level_sizes = sources[source], radix[source]
+            else:
+                level_sizes = node_sizes[parents] * radix[source]
+                # int32 unless a code could overflow it before renumbering
+                dtype = np.int64 if level_sizes.max() > np.iinfo(np.int32).max else np.int32
+                level_codes = node_codes[parents].astype(dtype, copy=False) * radix[source, None].astype(dtype) \
+                    + sources[source]
+            for i in np.flatnonzero(level_sizes > limit):
+                distinct, level_codes[i] = np.unique(level_codes[i], return_inverse=True)
+                level_sizes[i] = len(distinct)
+            node_codes[start:stop] = level_codes
+            node_sizes[start:stop] = level_sizes
+
+        # One representative row per combination present in the block
+        projection_codes = node_codes[self.projection_node]
+        sizes = node_sizes[self.projection_node]
+        offsets = np.concatenate(([0], np.cumsum(sizes)))
+        first_row = np.full(offsets[-1], -1, dtype=np.int64)
+        first_row[projection_codes + offsets[:-1, None]] = np.arange(n_rows)
+        combinations = np.flatnonzero(first_row >= 0)
+        combination_projection = np.searchsorted(offsets, combinations, side="right") - 1
+        combination_rows = first_row[combinations]
+
+        # Hash inputs by code: categorical codes index their value hashes, bits index (0, 1)
+        hash_inputs = np.concatenate((flat_hashes, [0, 1])).astype(np.uint64)
+        input_offsets = np.concatenate((category_offsets, np.full(self.n_sources - n_cat, len(flat_hashes))))
+        combination_hashes = np.zeros(len(combinations), dtype=np.uint64)
+        lengths = self.projection_lengths[combination_projection]
+        for position in range(self.projection_sources.shape[1]):
+            selected = np.flatnonzero(lengths > position)
+            source = self.projection_sources[combination_projection[selected], position]
+            value = hash_inputs[input_offsets[source] + sources[source, combination_rows[selected]]]
+            combination_hashes[selected] = CTR_HASH_MAGIC * (combination_hashes[selected] + CTR_HASH_MAGIC * value)
+
+        # CTR value per (ctr, combination), then per row through the combination codes
+        projection_starts = np.searchsorted(combinations, offsets)
+        counts = np.diff(projection_starts)[self.ctr_projection]
+        ctr = np.repeat(np.arange(len(self.ctr_projection)), counts)
+        combination = np.arange(len(ctr)) - np.repeat(np.cumsum(counts) - counts, counts) \
+            + projection_starts[self.ctr_projection][ctr]
+        entry = self._lookup(combination_hashes[combination], self.ctr_table[ctr])
+
+        table_sizes = sizes[self.ctr_projection]
+        table_offsets = np.cumsum(table_sizes) - table_sizes
+        projection = self.ctr_projection[ctr]
+        values = np.empty(table_sizes.sum(), dtype=np.float32)
+        values[table_offsets[ctr] + combinations[combination] - offsets[projection]] = \
+            self.ctr_values[self.ctr_value_offsets[ctr] + entry]
+        return values[projection_codes[self.ctr_projection] + table_offsets[:, None]]
+
+    def _lookup(self, keys: np.ndarray, tables: np.ndarray) -> np.ndarray:
+        """Entry index of each key in its CTR table, or the table size when it is absent."""
+        salted = keys ^ self.table_salt[tables]
+        entry = self.table_sizes[tables].copy()
+
+        # Linear probing; a lookup ends at its key or at an empty slot
+        pending = np.arange(len(keys))
+        slot = (salted >> self.slot_shift).astype(np.int64)
+        while len(pending):
+            slot_table = self.slot_table[slot]
+            found = (slot_table == tables[pending]) & (self.slot_key[slot] == salted[pending])
+            entry[pending[found]] = self.slot_entry[slot[found]]
+            probing = (slot_table != -1) & ~found
+            pending = pending[probing]
+            slot = (slot[probing] + 1) & self.slot_mask
+        return entry
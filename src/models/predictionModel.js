@@ -71,6 +71,92 @@ class PredictionModel {
     }
   }
 
+  /**
+   * Queue a large cohort for background scoring instead of waiting on /batch-predict
+   * @param {Array} studentsData - Array of structured student objects
+   * @returns {Object} The queued job, including job_id
+   */
+  async submitJob(studentsData, options = {}) {
+    try {
+      const response = await axios.post(
+        `${this.pythonServiceUrl}/jobs`,
+        { predictions: studentsData },
+        { timeout: this.timeout, params: options, headers: { "Content-Type": "application/json" } }
+      );
+      return response.data;
+    } catch (error) {
+      throw this.toServiceError(error, "job");
+    }
+  }
+
+  /**
+   * Status and progress of a scoring job
+   */
+  async getJob(jobId) {
+    try {
+      const response = await axios.get(`${this.pythonServiceUrl}/jobs/${jobId}`, { timeout: this.timeout });
+      return response.data;
+    } catch (error) {
+      throw this.toServiceError(error, "job status");
+    }
+  }
+
+  /**
+   * One page of a job's results; continue from next_offset until it is null
+   */
+  async getJobResults(jobId, offset = 0, limit = 1000) {
+    try {
+      const response = await axios.get(`${this.pythonServiceUrl}/jobs/${jobId}/results`, {
+        timeout: this.timeout,
+        params: { offset, limit },
+      });
+      return response.data;
+    } catch (error) {
+      throw this.toServiceError(error, "job results");
+    }
+  }
+
+  /**
+   * Risk-tier counts, mean dropout probability and histograms for a cohort, computed server-side
+   * @param {Array} studentsData - Array of structured student objects
+   * @param {String} groupBy - department, admission_type, residence_type or scholarship_status
+   */
+  async cohortRisk(studentsData, groupBy, bins = 10) {
+    try {
+      const response = await axios.post(
+        `${this.pythonServiceUrl}/cohort-risk`,
+        { predictions: studentsData },
+        {
+          timeout: this.timeout * 2,
+          params: { group_by: groupBy, bins },
+          headers: { "Content-Type": "application/json" },
+        }
+      );
+      return response.data;
+    } catch (error) {
+      throw this.toServiceError(error, "cohort risk");
+    }
+  }
+
+  /**
+   * Turn an axios error into the Error thrown to controllers
+   * @param {String} context - What was requested, e.g. "job status" or "cohort risk"
+   */
+  toServiceError(error, context) {
+    console.error(`Error calling Python ${context} service:`, error.message);
+
+    if (error.code === "ECONNREFUSED") {
+      return new Error("Prediction service is not running");
+    } else if (error.response) {
+      return new Error(
+        `Prediction service error: ${error.response.data.detail || error.response.data.error}`
+      );
+    } else if (error.request) {
+      return new Error("No response from prediction service");
+    }
+    return new Error(`Error configuring ${context} request`);
+  }
+
   /**
    * Health check for Python service
    */